@@ -0,0 +1,127 @@
+import time
+from enum import IntEnum
+
+from loguru import logger
+
+from app.core.metrics import metrics
+
+
+class BreakerState(IntEnum):
+    CLOSED = 0
+    HALF_OPEN = 1
+    OPEN = 2
+
+
+class CircuitOpenError(Exception):
+    """
+    熔断器打开时拒绝调用
+    """
+
+
+class CircuitBreaker:
+    """
+    熔断器
+
+    按秒分桶统计最近 window 秒内的调用数、失败数和慢调用数，调用数达到 min_calls 且
+    失败率或慢调用率超过阈值时打开；打开 open_seconds 秒后进入半开，只放行一个探测调用，
+    探测成功则关闭，失败则重新打开。
+    """
+
+    def __init__(
+        self,
+        name: str,
+        window: int = 10,
+        min_calls: int = 20,
+        error_rate: float = 0.5,
+        slow_call_seconds: float = 0.2,
+        slow_call_rate: float = 0.5,
+        open_seconds: float = 5.0,
+    ):
+        self.name = name
+        self.window = window
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate = slow_call_rate
+        self.open_seconds = open_seconds
+        self.state = BreakerState.CLOSED
+        self.opened_at = 0.0
+        self._probing = False
+        # 每个桶为 [秒, 调用数, 失败数, 慢调用数]
+        self._buckets: list[list[int]] = [[0, 0, 0, 0] for _ in range(window)]
+        metrics.gauge(f'{name}.breaker.state', lambda: int(self.state))
+
+    def _transition(self, state: BreakerState):
+        if state == self.state:
+            return
+        logger.warning('熔断器 {} 状态变更: {} -> {}', self.name, self.state.name, state.name)
+        metrics.incr(f'{self.name}.breaker.{state.name.lower()}')
+        self.state = state
+        if state == BreakerState.OPEN:
+            self.opened_at = time.monotonic()
+        elif state == BreakerState.CLOSED:
+            self._buckets = [[0, 0, 0, 0] for _ in range(self.window)]
+
+    def allow(self) -> bool:
+        """
+        判断是否放行本次调用，放行后必须调用 record 记录结果或 release 放弃本次调用
+        """
+        if self.state == BreakerState.OPEN:
+            if time.monotonic() - self.opened_at < self.open_seconds:
+                return False
+            self._transition(BreakerState.HALF_OPEN)
+        if self.state == BreakerState.HALF_OPEN:
+            if self._probing:
+                return False
+            self._probing = True
+        return True
+
+    def check(self):
+        """
+        不放行时抛出 CircuitOpenError
+        """
+        if not self.allow():
+            metrics.incr(f'{self.name}.breaker.rejected')
+            raise CircuitOpenError(f'{self.name} 熔断中')
+
+    def release(self):
+        """
+        放弃一次已放行但没有结果的调用（如被取消），不计入统计，半开状态下允许下一次探测
+        """
+        if self.state == BreakerState.HALF_OPEN:
+            self._probing = False
+
+    def record(self, success: bool, duration: float):
+        """
+        记录一次调用结果
+
+        Args:
+            success: 是否成功，服务端返回的业务错误应视为成功
+            duration: 调用耗时（秒）
+        """
+        slow = duration >= self.slow_call_seconds
+        if self.state == BreakerState.HALF_OPEN:
+            self._probing = False
+            self._transition(BreakerState.CLOSED if success and not slow else BreakerState.OPEN)
+            return
+
+        second = int(time.monotonic())
+        bucket = self._buckets[second % self.window]
+        if bucket[0] != second:
+            bucket[:] = [second, 0, 0, 0]
+        bucket[1] += 1
+        bucket[2] += not success
+        bucket[3] += slow
+        if self.state != BreakerState.CLOSED:
+            return
+
+        calls = failures = slow_calls = 0
+        for start, count, failed, slowed in self._buckets:
+            if second - start < self.window:
+                calls += count
+                failures += failed
+                slow_calls += slowed
+        if calls >= self.min_calls and (
+            failures / calls >= self.error_rate or slow_calls / calls >= self.slow_call_rate
+        ):
+            self._transition(BreakerState.OPEN)
@@ -1,3 +1,6 @@
+import os
+from typing import Literal
+
 from pydantic import PostgresDsn, computed_field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -35,17 +38,120 @@ class Settings(BaseSettings):
             path=self.POSTGRES_DB,
         )
 
+    # 只读副本，格式为 host 或 host:port，账号和库名与主库相同；为空时只读会话也使用主库
+    POSTGRES_REPLICA_SERVERS: list[str] = []
+    # 用户写入后该时间内的GET请求仍读主库，避免副本延迟导致读不到自己的写入
+    READ_YOUR_WRITES_SECONDS: int = 5
+
+    # 连接池配置，主库和每个副本各一个连接池
+    DB_POOL_SIZE: int = 20
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30  # 连接用尽时等待空闲连接的秒数
+    DB_POOL_RECYCLE: int = 1800  # 连接存活超过该秒数后在取出时重建，应小于数据库/代理的空闲断开时间
+    # 取出连接时先 ping 一次；关闭时依赖 SQLAlchemy 默认的断线失效：出错的连接及其之前建立的连接在下次取出时重建
+    DB_POOL_PRE_PING: bool = False
+    DB_POOL_WARMUP: bool = True  # 启动时预先建立 DB_POOL_SIZE 个连接
+    # 连接方式：direct 直连数据库；pgbouncer 经事务模式的 PgBouncer 连接，关闭预编译语句缓存并使用唯一语句名
+    DB_CONNECTION_MODE: Literal['direct', 'pgbouncer'] = 'direct'
+    DB_STATEMENT_CACHE_SIZE: int = 100  # 每个连接缓存的预编译语句数，pgbouncer 模式下固定为0
+    DB_APPLICATION_NAME: str = 'fastapi_demo'
+    # 以下为连接启动参数，PgBouncer 不转发，pgbouncer 模式下需在数据库或角色上配置
+    DB_STATEMENT_TIMEOUT_MS: int = 0  # 0 表示不限制
+    DB_JIT: bool = False  # 短查询为主时 JIT 编译的开销大于收益
+
+    @computed_field
+    @property
+    def DATABASE_REPLICA_URLS(self) -> list[PostgresDsn]:
+        urls = []
+        for server in self.POSTGRES_REPLICA_SERVERS:
+            host, _, port = server.partition(':')
+            urls.append(
+                PostgresDsn.build(
+                    scheme='postgresql+asyncpg',
+                    username=self.POSTGRES_USER,
+                    password=self.POSTGRES_PASSWORD,
+                    host=host,
+                    port=int(port or self.POSTGRES_PORT),
+                    path=self.POSTGRES_DB,
+                )
+            )
+        return urls
+
     # Redis配置
     REDIS_HOST: str
     REDIS_PORT: int
     REDIS_DB: int
     REDIS_PASSWORD: str | None = None
+    REDIS_MAX_CONNECTIONS: int = 20
+    REDIS_POOL_TIMEOUT: float = 5.0  # 连接用尽时等待空闲连接的秒数
+    REDIS_SOCKET_TIMEOUT: float = 1.0
+    REDIS_CONNECT_TIMEOUT: float = 1.0
+    # 熔断器：窗口内调用数达到下限且失败率或慢调用率超过阈值时打开
+    REDIS_BREAKER_WINDOW_SECONDS: int = 10
+    REDIS_BREAKER_MIN_CALLS: int = 20
+    REDIS_BREAKER_ERROR_RATE: float = 0.5
+    REDIS_BREAKER_SLOW_CALL_SECONDS: float = 0.2
+    REDIS_BREAKER_SLOW_CALL_RATE: float = 0.5
+    REDIS_BREAKER_OPEN_SECONDS: float = 5.0
+    # Redis不可用时的鉴权策略：fail_closed 拒绝请求；allow_recent 放行签名有效且近期验证过的令牌
+    REDIS_DEGRADED_POLICY: Literal['fail_closed', 'allow_recent'] = 'fail_closed'
+    REDIS_DEGRADED_RECENT_TTL: int = 60  # 秒
+    REDIS_DEGRADED_RECENT_SIZE: int = 10000
+    # 自动管道：合并同一事件循环周期内的并发命令，窗口为0时只合并同一周期
+    REDIS_AUTO_PIPELINE: bool = True
+    REDIS_PIPELINE_WINDOW_MS: float = 0
+    REDIS_PIPELINE_MAX_BATCH: int = 256
+    # 近端缓存：基于客户端缓存跟踪，服务端推送失效，命中时不访问Redis
+    REDIS_NEAR_CACHE: bool = False
+    REDIS_NEAR_CACHE_SIZE: int = 10000
+    REDIS_NEAR_CACHE_TTL: int = 300  # 秒，兜底过期时间
+    REDIS_NEAR_CACHE_PREFIXES: list[str] = ['session:', 'security_user:', 'permission:', 'token:watermark']
 
     # JWT配置
     SECRET_KEY: str
     ALGORITHM: str
     ACCESS_TOKEN_EXPIRE_MINUTES: int
     REFRESH_TOKEN_EXPIRE_MINUTES: int
+    JWT_DECODE_CACHE_SIZE: int = 4096
+    # 非对称签名（ALGORITHM 为 ES256/EdDSA 时生效）
+    JWT_KEY_DIR: str = 'keys'
+    JWT_ACTIVE_KID: str | None = None
+    JWKS_MAX_AGE: int = 300  # 秒
+    SESSION_MAX_PER_USER: int = 10
+    # 登录限流：按用户名和客户端IP的令牌桶
+    LOGIN_USER_BUCKET_CAPACITY: int = 5
+    LOGIN_USER_REFILL_PER_MINUTE: int = 5
+    LOGIN_IP_BUCKET_CAPACITY: int = 30
+    LOGIN_IP_REFILL_PER_MINUTE: int = 30
+    # 已吊销令牌的本地布隆过滤器
+    REVOCATION_BLOOM_CAPACITY: int = 100000
+    REVOCATION_BLOOM_REBUILD_SECONDS: int = 3600
+
+    # 认证用户缓存配置
+    SECURITY_USER_CACHE_SIZE: int = 10000
+    SECURITY_USER_CACHE_TTL: int = 300  # 秒
+
+    # 无状态访问令牌：令牌携带角色和权限位图，鉴权时不访问数据库
+    STATELESS_ACCESS_TOKEN: bool = False
+    STATELESS_ACCESS_TOKEN_EXPIRE_MINUTES: int = 5
+    # 本地缓存吊销水位的秒数，也是吊销的生效延迟上限：退出登录、吊销会话或权限变更后，
+    # 已签发的无状态令牌在该时间内仍可能被放行；设为0时每次鉴权都读取水位（开启近端缓存时命中本地）
+    STATELESS_WATERMARK_POLL_SECONDS: float = 1.0
+
+    # 分页总数缓存时间（秒），用于 CountStrategy.CACHED
+    COUNT_CACHE_TTL: int = 60
+
+    # 批量写入达到该行数时使用 COPY，需不大于 USER_BULK_MAX_SIZE，否则批量添加用户永远走不到 COPY
+    BULK_COPY_THRESHOLD: int = 200
+    # 批量添加用户单次请求的最大行数
+    USER_BULK_MAX_SIZE: int = 500
+
+    # 密码哈希执行器配置
+    PASSWORD_EXECUTOR: Literal['thread', 'process'] = 'thread'
+    PASSWORD_MAX_WORKERS: int = 4
+    PASSWORD_MAX_QUEUE: int = 64
+    # 批量哈希最多同时占用的工作线程数，不超过 PASSWORD_MAX_WORKERS - 1，其余线程留给登录校验
+    PASSWORD_BULK_WORKERS: int = min(4, os.cpu_count() or 1)
 
 
 settings = Settings()  # type: ignore
@@ -1,36 +1,354 @@
-from collections.abc import AsyncGenerator
+import asyncio
+import functools
+import inspect
+import itertools
+import re
+import time
+from collections.abc import AsyncGenerator, AsyncIterator, Awaitable, Callable
+from contextlib import AsyncExitStack, asynccontextmanager
+from contextvars import ContextVar
 from datetime import datetime
+from uuid import uuid4
 
+from fastapi import Depends, Request
+from fastapi.routing import APIRoute
 from loguru import logger
-from sqlalchemy import insert, select, text
+from sqlalchemy import event, insert, select, text
+from sqlalchemy.engine import ExceptionContext
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import ORMExecuteState, Session, SessionTransaction
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.sql.elements import TextClause
 
 from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.redis import REDIS_UNAVAILABLE_ERRORS, redis_client
 from app.models.base import Base
 from app.models.user import SUPERUSER_ID, SUPERUSER_NAME, SUPERUSER_PASSWORD, User
+from app.utils.jwt import decode_token
 from app.utils.pwd import get_password_hash
 
+# GET/HEAD 请求默认读副本
+READ_METHODS = frozenset({'GET', 'HEAD'})
+RECENT_WRITE_PREFIX = 'db:recent_write:'
+# 以这些关键字开头的文本SQL视为只读；WITH 可能包含写入的CTE，按写入处理
+_READ_ONLY_SQL = re.compile(r'\s*(SELECT|SHOW|EXPLAIN|VALUES)\b', re.IGNORECASE)
+
+
+class MeteredQueuePool(AsyncAdaptedQueuePool):
+    """
+    记录取连接等待时间的连接池，包含连接耗尽时的排队和新建连接的耗时
+    """
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            metrics.observe('db.pool.checkout_wait_seconds', time.perf_counter() - start)
+
+
+def _connect_args() -> dict:
+    """
+    asyncpg 连接参数
+    """
+    server_settings = {'application_name': settings.DB_APPLICATION_NAME}
+    if settings.DB_CONNECTION_MODE == 'pgbouncer':
+        # 事务模式下同一连接的相邻事务可能落在不同的服务端连接上，按连接缓存的预编译语句可能不存在或重名，
+        # 因此关闭缓存，并为每条预编译语句生成唯一名称
+        if settings.DB_STATEMENT_TIMEOUT_MS or settings.DB_JIT:
+            logger.warning('pgbouncer 模式下不发送 statement_timeout/jit 启动参数，请在数据库或角色上配置')
+        return {
+            'statement_cache_size': 0,
+            'prepared_statement_cache_size': 0,
+            'prepared_statement_name_func': lambda: f'__asyncpg_{uuid4()}__',
+            'server_settings': server_settings,
+        }
+    server_settings['jit'] = 'on' if settings.DB_JIT else 'off'
+    if settings.DB_STATEMENT_TIMEOUT_MS:
+        server_settings['statement_timeout'] = str(settings.DB_STATEMENT_TIMEOUT_MS)
+    return {
+        'statement_cache_size': settings.DB_STATEMENT_CACHE_SIZE,
+        'prepared_statement_cache_size': settings.DB_STATEMENT_CACHE_SIZE,
+        'server_settings': server_settings,
+    }
+
+
+def _create_engine(url: str):
+    return create_async_engine(
+        url,
+        echo=False,
+        connect_args=_connect_args(),
+        poolclass=MeteredQueuePool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+    )
+
+
 # engine = create_async_engine(str(settings.DATABASE_URL))
-engine = create_async_engine(
-    str(settings.DATABASE_URL),
-    echo=False,
-    pool_size=20,
-    max_overflow=10,
-    pool_timeout=30,
-    pool_recycle=1800,  # 30分钟回收连接
-    pool_pre_ping=True,  # 重要：连接前健康检查
-)
+engine = _create_engine(str(settings.DATABASE_URL))
 AsyncSessionLocal = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False, autoflush=False)
 
+# 只读副本，多个副本轮询使用
+replica_engines = [_create_engine(str(url)) for url in settings.DATABASE_REPLICA_URLS]
+_read_sessionmakers = itertools.cycle(
+    [
+        async_sessionmaker(replica, class_=AsyncSession, expire_on_commit=False, autoflush=False)
+        for replica in replica_engines
+    ]
+    or [AsyncSessionLocal]
+)
+
+
+def _track_connection_usage(target_engine):
+    """
+    统计每次取出连接的持有时长和实际执行SQL的时长，两者差距即连接空占的时间
+    """
+    sync_engine = target_engine.sync_engine
+
+    @event.listens_for(sync_engine, 'checkout')
+    def _checkout(dbapi_connection, connection_record, connection_proxy):
+        connection_record.info['checkout_at'] = time.perf_counter()
+        connection_record.info['busy_seconds'] = 0.0
+
+    @event.listens_for(sync_engine, 'checkin')
+    def _checkin(dbapi_connection, connection_record):
+        if (checkout_at := connection_record.info.pop('checkout_at', None)) is None:
+            return
+        metrics.observe('db.connection.hold_seconds', time.perf_counter() - checkout_at)
+        metrics.observe('db.connection.busy_seconds', connection_record.info.pop('busy_seconds', 0.0))
+
+    @event.listens_for(sync_engine, 'before_cursor_execute')
+    def _before_execute(connection, cursor, statement, parameters, context, executemany):
+        connection.info['execute_at'] = time.perf_counter()
+
+    @event.listens_for(sync_engine, 'after_cursor_execute')
+    def _after_execute(connection, cursor, statement, parameters, context, executemany):
+        if (execute_at := connection.info.pop('execute_at', None)) is not None:
+            elapsed = time.perf_counter() - execute_at
+            connection.info['busy_seconds'] = connection.info.get('busy_seconds', 0.0) + elapsed
+
+
+def _track_pool(name: str, target_engine):
+    """
+    导出连接池状态，并在断线错误时记录连接池失效
+    """
+    sync_engine = target_engine.sync_engine
+    # dispose 会替换连接池，每次导出时重新读取 engine.pool
+    metrics.gauge(f'db.pool.{name}.size', lambda: sync_engine.pool.size())
+    metrics.gauge(f'db.pool.{name}.checked_out', lambda: sync_engine.pool.checkedout())
+    metrics.gauge(f'db.pool.{name}.checked_in', lambda: sync_engine.pool.checkedin())
+    metrics.gauge(f'db.pool.{name}.overflow', lambda: sync_engine.pool.overflow())
+
+    @event.listens_for(sync_engine, 'handle_error')
+    def _handle_error(context: ExceptionContext):
+        # 断线后的连接池失效由 SQLAlchemy 默认完成，这里只记录指标和日志
+        if context.is_disconnect and not context.is_pre_ping:
+            metrics.incr(f'db.pool.{name}.disconnect')
+            logger.warning('数据库 {} 连接断开，连接池已失效: {}', name, context.original_exception)
+
+
+_engines = {'primary': engine, **{f'replica{i}': replica for i, replica in enumerate(replica_engines)}}
+for _name, _engine in _engines.items():
+    _track_connection_usage(_engine)
+    _track_pool(_name, _engine)
+
+
+async def warm_up_pools():
+    """
+    启动时为每个连接池预先建立 DB_POOL_SIZE 个连接，避免部署后的首批请求承担建连耗时
+    """
+    for name, target_engine in _engines.items():
+        start = time.perf_counter()
+        # 同时持有所有连接，迫使连接池新建而不是复用刚归还的连接；等全部建连结束再归还，失败的不影响其它连接
+        async with AsyncExitStack() as stack:
+            results = await asyncio.gather(
+                *(stack.enter_async_context(target_engine.connect()) for _ in range(settings.DB_POOL_SIZE)),
+                return_exceptions=True,
+            )
+        errors = [result for result in results if isinstance(result, Exception)]
+        if errors:
+            logger.warning('数据库 {} 连接池预热失败 {}/{}: {}', name, len(errors), len(results), errors[0])
+        else:
+            logger.info('数据库 {} 连接池预热完成，耗时 {:.3f}s', name, time.perf_counter() - start)
+
+
+async def dispose_engines():
+    """
+    关闭时释放所有连接池中的连接
+    """
+    for target_engine in _engines.values():
+        await target_engine.dispose()
+
+
+# 当前请求通过依赖项打开的会话的释放函数，由 ReleaseSessionRoute 在处理函数返回后调用
+_request_releases: ContextVar[list[Callable[[], Awaitable[None]]] | None] = ContextVar('request_releases', default=None)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _track_execute(state: ORMExecuteState):
+    if state.is_insert or state.is_update or state.is_delete:
+        writes = True
+    elif isinstance(state.statement, TextClause):
+        # text() 语句的 is_select 始终为False，按SQL文本判断
+        writes = not _READ_ONLY_SQL.match(state.statement.text)
+    else:
+        writes = not state.is_select
+    if writes:
+        state.session.info['has_writes'] = True
+
+
+@event.listens_for(Session, 'after_flush')
+def _track_flush(session: Session, flush_context):
+    session.info['has_writes'] = True
+
+
+@event.listens_for(Session, 'after_transaction_end')
+def _reset_writes(session: Session, transaction: SessionTransaction):
+    if transaction.parent is None:
+        session.info.pop('has_writes', None)
+
+
+@event.listens_for(Session, 'after_begin')
+def _begin_read_only(session: Session, transaction: SessionTransaction, connection):
+    # 会话首次使用连接时才开始事务，只读声明必须是事务内的第一条语句
+    if session.info.get('read_only'):
+        connection.exec_driver_sql('SET TRANSACTION READ ONLY')
+
 
-async def get_db() -> AsyncGenerator[AsyncSession, None]:
+def has_pending_writes(db: AsyncSession) -> bool:
     """
-    获取数据库会话的依赖项
+    当前事务是否已写入或有待写入的变更，有则读取必须走本会话以看到自己的写入
     """
+    return bool(db.info.get('has_writes') or db.new or db.dirty or db.deleted)
+
+
+def is_read_only(db: AsyncSession) -> bool:
+    """
+    是否为 read_session 打开的只读会话
+    """
+    return bool(db.info.get('read_only'))
+
+
+def after_commit(db: AsyncSession, callback: Callable[[], Awaitable[None]]):
+    """
+    注册在会话提交成功后执行的回调（如缓存失效），回滚时不会执行
+
+    Args:
+        db: 数据库会话
+        callback: 无参异步回调
+    """
+    db.info.setdefault('after_commit', []).append(callback)
+
+
+async def run_after_commit(db: AsyncSession):
+    """
+    执行并清空会话上注册的提交后回调
+    """
+    callbacks = db.info.pop('after_commit', [])
+    for callback in callbacks:
+        try:
+            await callback()
+        except Exception:
+            logger.exception('提交后回调执行失败')
+
+
+async def _request_subject(request: Request | None) -> str | None:
+    """
+    从请求的访问令牌中取出用户名，用于读写一致性判断
+    """
+    if request is None:
+        return None
+    scheme, _, token = request.headers.get('authorization', '').partition(' ')
+    if scheme.lower() != 'bearer' or not token:
+        return None
+    payload = await decode_token(token)
+    return payload.get('subject') if payload else None
+
+
+async def _mark_recent_write(request: Request | None):
+    if not (subject := await _request_subject(request)):
+        return
+    try:
+        await redis_client.set(f'{RECENT_WRITE_PREFIX}{subject}', 1, ex=settings.READ_YOUR_WRITES_SECONDS)
+    except REDIS_UNAVAILABLE_ERRORS:
+        logger.warning('记录最近写入失败，副本读取可能读不到该用户刚写入的数据')
+
+
+async def _wrote_recently(request: Request) -> bool:
+    if not (subject := await _request_subject(request)):
+        return False
+    try:
+        return bool(await redis_client.exists(f'{RECENT_WRITE_PREFIX}{subject}'))
+    except REDIS_UNAVAILABLE_ERRORS:
+        return True  # 无法确认时读主库
+
+
+@asynccontextmanager
+async def read_session() -> AsyncIterator[AsyncSession]:
+    """
+    打开副本上的只读会话，事务开始时设为只读，结束时直接关闭（回滚），不提交
+    """
+    async with next(_read_sessionmakers)() as current_db:
+        current_db.info['read_only'] = True
+        yield current_db
+
+
+async def _commit(db: AsyncSession, request: Request | None):
+    wrote = has_pending_writes(db)
+    await db.commit()
+    if wrote and replica_engines:
+        await _mark_recent_write(request)
+    await run_after_commit(db)
+
+
+def _on_handler_return(release: Callable[[], Awaitable[None]]):
+    releases = _request_releases.get()
+    if releases is None:
+        releases = []
+        _request_releases.set(releases)
+    releases.append(release)
+
+
+async def release_request_sessions():
+    """
+    处理函数返回后立即提交主库会话、关闭只读会话，把连接归还连接池，不必等到响应序列化完成；
+    依赖项退出时的提交/关闭随后变为空操作
+    """
+    if not (releases := _request_releases.get()):
+        return
+    _request_releases.set(None)
+    for release in releases:
+        await release()
+
+
+class ReleaseSessionRoute(APIRoute):
+    """
+    处理函数返回后立即释放请求的数据库会话的路由类
+    """
+
+    def __init__(self, path: str, endpoint: Callable, **kwargs):
+        if inspect.iscoroutinefunction(endpoint):
+            original = endpoint
+
+            @functools.wraps(original)
+            async def endpoint(*args, **kwargs):
+                result = await original(*args, **kwargs)
+                await release_request_sessions()
+                return result
+
+        super().__init__(path, endpoint, **kwargs)
+
+
+@asynccontextmanager
+async def _write_session(request: Request | None) -> AsyncIterator[AsyncSession]:
     async with AsyncSessionLocal() as current_db:
         try:
             yield current_db
-            await current_db.commit()
+            await _commit(current_db, request)
         except Exception:
             logger.exception('数据库会话提交失败')
             await current_db.rollback()
@@ -39,6 +357,27 @@ async def get_db() -> AsyncGenerator[AsyncSession, None]:
             await current_db.close()
 
 
+async def get_db(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    """
+    获取主库会话的依赖项，处理函数返回后提交
+    """
+    async with _write_session(request) as current_db:
+        _on_handler_return(functools.partial(_commit, current_db, request))
+        yield current_db
+
+
+async def get_routed_db(request: Request, db: AsyncSession = Depends(get_db)) -> AsyncGenerator[AsyncSession, None]:
+    """
+    按请求路由会话：GET/HEAD 读副本，其它请求和用户最近写入后的读取使用主库会话（与 get_db 共用）
+    """
+    if request.method in READ_METHODS and not (replica_engines and await _wrote_recently(request)):
+        async with read_session() as current_db:
+            _on_handler_return(current_db.close)
+            yield current_db
+    else:
+        yield db
+
+
 async def create_superuser():
     async with AsyncSessionLocal() as db:
         user = await db.scalar(select(User).where(User.id == SUPERUSER_ID))
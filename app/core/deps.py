@@ -1,24 +1,40 @@
+import math
+import time
 from collections.abc import Callable, Coroutine
 from datetime import datetime
-from typing import Annotated, Any
+from typing import TYPE_CHECKING, Annotated, Any
 
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 
-from app.core.redis import get_redis
-from app.models.user import UserVO
-from app.service import AuthService, get_auth_service
-from app.utils.jwt import decode_token
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.redis import REDIS_UNAVAILABLE_ERRORS, get_redis
+from app.models.security import SecurityUser
+from app.repository.user import UserRepository, get_primary_user_repository
+from app.utils.jwt import JwtPayload, decode_token, is_token_blacklisted, token_digest
+
+if TYPE_CHECKING:
+    from app.service.auth import AuthService
 
 # OAuth2密码流
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl='/api/v1/auth/token')
 
+# 近期通过完整校验的令牌，Redis不可用且策略为 allow_recent 时据此放行
+_recently_verified: LRUCache[bytes, SecurityUser] = LRUCache(
+    settings.REDIS_DEGRADED_RECENT_SIZE, settings.REDIS_DEGRADED_RECENT_TTL
+)
+
 
 async def get_current_user(
     token: Annotated[str, Depends(oauth2_scheme)],
-    auth_service: Annotated[AuthService, Depends(get_auth_service)],
+    user_repository: Annotated[UserRepository, Depends(get_primary_user_repository)],
     redis=Depends(get_redis),
 ):
+    # app.service 中的服务工厂依赖 get_current_user，在函数内导入以避免循环导入
+    from app.service.auth import AuthService
+
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail='token 无效',
@@ -42,42 +58,98 @@ async def get_current_user(
     if exp < datetime.now().timestamp():  # 令牌已过期
         raise credentials_exception
 
-    user = await auth_service.get_authenticated_user(username)
+    try:
+        user = await _verify_token_state(token, payload, AuthService(user_repository, redis), redis)
+    except REDIS_UNAVAILABLE_ERRORS:
+        # 签名和有效期已在上面校验，这里只决定能否在无法确认吊销状态时放行
+        if settings.REDIS_DEGRADED_POLICY == 'allow_recent' and (user := _recently_verified.get(token_digest(token))):
+            metrics.incr('auth.degraded.allowed')
+            return user
+        metrics.incr('auth.degraded.rejected')
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail='认证服务暂不可用',
+            headers={'Retry-After': str(math.ceil(settings.REDIS_BREAKER_OPEN_SECONDS))},
+        )
     if user is None:
         raise credentials_exception
 
+    if settings.REDIS_DEGRADED_POLICY == 'allow_recent':
+        ttl = min(settings.REDIS_DEGRADED_RECENT_TTL, exp - time.time())
+        _recently_verified.set(token_digest(token), user, ttl=ttl)
     return user
 
 
+async def _verify_token_state(
+    token: str, payload: JwtPayload, auth_service: 'AuthService', redis
+) -> SecurityUser | None:
+    """
+    校验令牌的吊销状态和所属会话，返回认证用户，令牌无效时返回None
+    """
+    from app.service.stateless import resolve_stateless_user
+
+    if await is_token_blacklisted(redis, token):
+        return None
+
+    # 无状态令牌直接根据声明鉴权，失败时回退到有状态校验
+    if 'perm' in payload and (user := await resolve_stateless_user(redis, payload)):
+        return user
+
+    if not (session_id := payload.get('sid')):
+        return None
+    return await auth_service.get_authenticated_user(payload['subject'], session_id, token)
+
+
 def has_authority(perms: str):
     """
     检查当前用户是否具有权限，支持通配符模式
     例如：如果用户有sys:user:*权限，那么请求sys:user:read时应该匹配成功
     """
 
-    async def check_permission(user: Annotated[UserVO, Depends(get_current_user)]) -> bool:
-        # 检查精确匹配
-        if perms in user.permissions:
+    async def check_permission(user: Annotated[SecurityUser, Depends(get_current_user)]) -> bool:
+        if user.permission_matcher.match(perms):
             return True
 
-        for perm in user.permissions:
-            if perm.endswith('*'):
-                prefix = perm[:-1]
-                if perms.startswith(prefix):
-                    return True
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail='无权限')
+
+    return check_permission
+
+
+def has_any_authority(*perms: str):
+    """
+    检查当前用户是否具有任意一个权限
+    """
+
+    async def check_permission(user: Annotated[SecurityUser, Depends(get_current_user)]) -> bool:
+        if user.permission_matcher.match_any(perms):
+            return True
+
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail='无权限')
+
+    return check_permission
+
+
+def has_all_authority(*perms: str):
+    """
+    检查当前用户是否同时具有所有权限
+    """
+
+    async def check_permission(user: Annotated[SecurityUser, Depends(get_current_user)]) -> bool:
+        if user.permission_matcher.match_all(perms):
+            return True
 
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail='无权限')
 
     return check_permission
 
 
-def has_role(role: str) -> Callable[[Annotated[UserVO, Depends(get_current_user)]], Coroutine[Any, Any, bool]]:
+def has_role(role: str) -> Callable[[Annotated[SecurityUser, Depends(get_current_user)]], Coroutine[Any, Any, bool]]:
     """
     检查当前用户是否具有角色
     """
 
-    async def check_role(user: Annotated[UserVO, Depends(get_current_user)]) -> bool:
-        if role in user.roles:
+    async def check_role(user: Annotated[SecurityUser, Depends(get_current_user)]) -> bool:
+        if user.roles and role in user.roles:
             return True
 
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail='无权限')
@@ -0,0 +1,68 @@
+import threading
+from collections import defaultdict
+from collections.abc import Callable
+
+
+class Metrics:
+    """
+    进程内指标收集器，提供计数器、仪表盘和耗时统计，通过 /metrics 接口导出
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: dict[str, int] = defaultdict(int)
+        self._gauges: dict[str, Callable[[], float | int]] = {}
+        self._timings: dict[str, list[float]] = {}
+
+    def incr(self, name: str, value: int = 1):
+        """
+        计数器累加
+
+        Args:
+            name: 指标名
+            value: 增量
+        """
+        with self._lock:
+            self._counters[name] += value
+
+    def gauge(self, name: str, getter: Callable[[], float | int]):
+        """
+        注册仪表盘指标，导出时调用 getter 获取当前值
+
+        Args:
+            name: 指标名
+            getter: 返回当前值的函数
+        """
+        self._gauges[name] = getter
+
+    def observe(self, name: str, value: float):
+        """
+        记录一次耗时/数值观测，导出 count/sum/max
+
+        Args:
+            name: 指标名
+            value: 观测值
+        """
+        with self._lock:
+            stat = self._timings.setdefault(name, [0, 0.0, 0.0])
+            stat[0] += 1
+            stat[1] += value
+            stat[2] = max(stat[2], value)
+
+    def snapshot(self) -> dict:
+        """
+        导出当前所有指标
+        """
+        with self._lock:
+            counters = dict(self._counters)
+            timings = {
+                name: {'count': count, 'sum': total, 'max': peak, 'avg': total / count if count else 0.0}
+                for name, (count, total, peak) in self._timings.items()
+            }
+        gauges = {name: getter() for name, getter in self._gauges.items()}
+        return {'counters': counters, 'gauges': gauges, 'timings': timings}
+
+
+metrics = Metrics()
+
+__all__ = ['Metrics', 'metrics']
@@ -1,20 +1,376 @@
+import asyncio
+import time
+from contextvars import ContextVar
+
 import redis.asyncio as redis
+from loguru import logger
 from redis.asyncio import Redis
+from redis.asyncio.client import Pipeline
+from redis.exceptions import ConnectionError as RedisConnectionError
+from redis.exceptions import ResponseError
+from redis.exceptions import TimeoutError as RedisTimeoutError
 
+from app.core.breaker import CircuitBreaker, CircuitOpenError
+from app.core.cache import LRUCache
 from app.core.config import settings
+from app.core.metrics import metrics
+
+INVALIDATE_CHANNEL = '__redis__:invalidate'
+# Redis不可用（连接失败、超时或熔断中）时抛出的异常
+REDIS_UNAVAILABLE_ERRORS = (CircuitOpenError, RedisConnectionError, RedisTimeoutError)
+
+# 阻塞型或依赖连接状态的命令不能合并进管道
+_UNBATCHABLE_COMMANDS = frozenset(
+    {
+        'BLPOP',
+        'BRPOP',
+        'BRPOPLPUSH',
+        'BLMOVE',
+        'BLMPOP',
+        'BZPOPMIN',
+        'BZPOPMAX',
+        'BZMPOP',
+        'XREAD',
+        'XREADGROUP',
+        'WAIT',
+        'SUBSCRIBE',
+        'PSUBSCRIBE',
+        'SSUBSCRIBE',
+        'MONITOR',
+        'MULTI',
+        'EXEC',
+        'WATCH',
+        'UNWATCH',
+        'SELECT',
+        'CLIENT',
+    }
+)
+
+
+# 当前熔断调用中取连接累计等待的秒数，由 _guarded 设置，从调用耗时中扣除
+_checkout_wait: ContextVar[list[float] | None] = ContextVar('redis_checkout_wait', default=None)
+
+
+class MeteredConnectionPool(redis.BlockingConnectionPool):
+    """
+    连接耗尽时排队等待的连接池，记录取连接的等待时间
+    """
+
+    async def get_connection(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await super().get_connection(*args, **kwargs)
+        finally:
+            waited = time.perf_counter() - start
+            metrics.observe('redis.pool.checkout_wait_seconds', waited)
+            if (checkout_wait := _checkout_wait.get()) is not None:
+                checkout_wait[0] += waited
+
+
+async def _guarded(breaker: CircuitBreaker, call):
+    """
+    经过熔断器执行一次Redis往返，连接错误和超时计为失败，服务端返回的错误计为成功，取消的调用不计入。
+    耗时不含排队取连接的时间：连接池耗尽是本进程的拥塞，不代表Redis变慢
+    """
+    breaker.check()
+    checkout_wait = [0.0]
+    token = _checkout_wait.set(checkout_wait)
+    start = time.perf_counter()
+
+    def duration() -> float:
+        return time.perf_counter() - start - checkout_wait[0]
+
+    try:
+        result = await call()
+    except ResponseError:
+        breaker.record(True, duration())
+        raise
+    except asyncio.CancelledError:
+        # 调用方超时或断开导致的取消不说明Redis的健康状况
+        breaker.release()
+        raise
+    except BaseException:
+        breaker.record(False, duration())
+        raise
+    finally:
+        _checkout_wait.reset(token)
+    breaker.record(True, duration())
+    return result
+
+
+class BreakerPipeline(Pipeline):
+    breaker: CircuitBreaker
+
+    async def execute(self, raise_on_error: bool = True):
+        if not self.command_stack:
+            return await super().execute(raise_on_error)
+        return await _guarded(self.breaker, lambda: super(BreakerPipeline, self).execute(raise_on_error))
+
+
+class BreakerRedis(Redis):
+    """
+    受熔断器保护的Redis客户端，单条命令、管道和Lua脚本都经过熔断器
+    """
+
+    def __init__(self, *args, breaker: CircuitBreaker, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.breaker = breaker
+
+    async def execute_command(self, *args, **options):
+        return await _guarded(self.breaker, lambda: super(BreakerRedis, self).execute_command(*args, **options))
+
+    def pipeline(self, transaction: bool = True, shard_hint: str | None = None) -> Pipeline:
+        pipe = BreakerPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+        pipe.breaker = self.breaker
+        return pipe
+
+
+class AutoPipelineRedis(BreakerRedis):
+    """
+    自动管道客户端
+
+    同一个事件循环周期内（或 pipeline_window 秒内）并发发出的命令合并为一个非事务管道发送，
+    再把各自的结果分发回调用方。高并发时一次往返、一个连接即可完成一批命令，避免排队取连接。
+    对调用方透明，pipeline()、pubsub() 和 Lua 脚本的用法不变。每个批次作为一次往返计入熔断器。
+    """
+
+    def __init__(self, *args, pipeline_window: float = 0.0, max_batch: int = 256, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pipeline_window = pipeline_window
+        self.max_batch = max_batch
+        self._pending: list[tuple[tuple, dict, asyncio.Future]] = []
+        self._flush_handle: asyncio.Handle | None = None
+        self._inflight: set[asyncio.Task] = set()
+
+    async def execute_command(self, *args, **options):
+        if str(args[0]).upper() in _UNBATCHABLE_COMMANDS:
+            return await super().execute_command(*args, **options)
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((args, options, future))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._flush_handle is None:
+            if self.pipeline_window > 0:
+                self._flush_handle = loop.call_later(self.pipeline_window, self._flush)
+            else:
+                self._flush_handle = loop.call_soon(self._flush)
+        return await future
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        task = asyncio.ensure_future(self._execute_batch(batch))
+        self._inflight.add(task)
+        task.add_done_callback(self._inflight.discard)
+
+    async def _execute_batch(self, batch: list[tuple[tuple, dict, asyncio.Future]]):
+        metrics.incr('redis.pipeline.batches')
+        metrics.observe('redis.pipeline.batch_size', len(batch))
+        pipe = self.pipeline(transaction=False)
+        for args, options, _ in batch:
+            pipe.execute_command(*args, **options)
+        try:
+            results = await pipe.execute(raise_on_error=False)
+        except asyncio.CancelledError:
+            for *_, future in batch:
+                future.cancel()
+            raise
+        except Exception as e:
+            # 连接级错误影响整批命令
+            for *_, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (*_, future), result in zip(batch, results, strict=True):
+            if future.done():  # 调用方已取消
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    async def aclose(self, close_connection_pool: bool | None = None):
+        self._flush()
+        if self._inflight:
+            await asyncio.gather(*self._inflight, return_exceptions=True)
+        await super().aclose(close_connection_pool)
+
+
+class NearCache:
+    """
+    基于 Redis 客户端缓存的进程内近端缓存
+
+    专用连接以广播模式（CLIENT TRACKING BCAST）订阅指定前缀的键，任何客户端修改这些键时
+    服务端推送失效消息，读取命中时无需访问Redis。失效消息通过 REDIRECT 投递到
+    __redis__:invalidate 频道，RESP2 连接同样可用；服务端不支持 CLIENT TRACKING（Redis 6 以下）
+    或跟踪连接断开期间，所有读取直接访问Redis。
+    """
+
+    def __init__(self, prefixes: list[str], maxsize: int, ttl: float, keepalive: float = 5.0):
+        self.prefixes = tuple(prefixes)
+        self.keepalive = keepalive
+        self.enabled = False
+        # 每个键缓存一个字典：GET 的结果存在 'GET'，HGET 的结果按字段存在 ('HGET', field)
+        self.local: LRUCache[str, dict] = LRUCache(maxsize, ttl)
+        # 读取进行中的键，读取期间收到失效消息则丢弃读到的值，避免旧值写入缓存
+        self._fetching: dict[str, object] = {}
+        metrics.gauge('redis.near_cache.size', lambda: len(self.local))
+        metrics.gauge('redis.near_cache.enabled', lambda: int(self.enabled))
 
-# Redis连接池
-redis_pool = redis.ConnectionPool(
+    def _tracked(self, key: str) -> bool:
+        return self.enabled and key.startswith(self.prefixes)
+
+    def _lookup(self, key: str, field) -> tuple[bool, object]:
+        if self._tracked(key) and (entry := self.local.get(key)) is not None and field in entry:
+            metrics.incr('redis.near_cache.hit')
+            return True, entry[field]
+        metrics.incr('redis.near_cache.miss')
+        return False, None
+
+    def _begin(self, key: str) -> object | None:
+        return self._fetching.setdefault(key, object()) if self._tracked(key) else None
+
+    def _store(self, key: str, field, value, token: object | None):
+        if token is None or self._fetching.pop(key, None) is not token or not self.enabled:
+            return
+        if (entry := self.local.get(key)) is None:
+            entry = {}
+            self.local.set(key, entry)
+        entry[field] = value
+
+    def invalidate(self, keys: list[str] | None):
+        """
+        处理失效消息，keys 为 None 表示服务端执行了 FLUSHDB/FLUSHALL
+        """
+        if keys is None:
+            self.local.clear()
+            self._fetching.clear()
+        else:
+            for key in keys:
+                self.local.pop(key)
+                self._fetching.pop(key, None)
+        metrics.incr('redis.near_cache.invalidate')
+
+    async def mget(self, redis: Redis, *keys: str) -> list:
+        """
+        批量读取字符串键，未命中的键合并为一次 MGET
+        """
+        values: list = [None] * len(keys)
+        missing = []
+        for i, key in enumerate(keys):
+            hit, values[i] = self._lookup(key, 'GET')
+            if not hit:
+                missing.append(i)
+        if missing:
+            tokens = [self._begin(keys[i]) for i in missing]
+            fetched = await redis.mget(*(keys[i] for i in missing))
+            for i, token, value in zip(missing, tokens, fetched, strict=True):
+                values[i] = value
+                self._store(keys[i], 'GET', value, token)
+        return values
+
+    async def get(self, redis: Redis, key: str):
+        return (await self.mget(redis, key))[0]
+
+    async def hget(self, redis: Redis, key: str, field: str):
+        hit, value = self._lookup(key, ('HGET', field))
+        if hit:
+            return value
+        token = self._begin(key)
+        value = await redis.hget(key, field)
+        self._store(key, ('HGET', field), value, token)
+        return value
+
+    async def run(self, pool: redis.ConnectionPool):
+        """
+        后台任务：维护跟踪连接并处理失效消息，断线后清空缓存并重连
+        """
+        while True:
+            connection = pool.make_connection()
+            try:
+                await connection.connect()
+                await connection.send_command('CLIENT', 'ID')
+                client_id = await connection.read_response()
+                prefixes = [arg for prefix in self.prefixes for arg in ('PREFIX', prefix)]
+                await connection.send_command('CLIENT', 'TRACKING', 'ON', 'REDIRECT', client_id, 'BCAST', *prefixes)
+                await connection.read_response()
+                await connection.send_command('SUBSCRIBE', INVALIDATE_CHANNEL)
+                await connection.read_response()
+                self.enabled = True
+                logger.info('Redis近端缓存已启用，跟踪前缀: {}', ', '.join(self.prefixes))
+                waiting_pong = False
+                while True:
+                    message = await connection.read_response(timeout=self.keepalive)
+                    if message is None:
+                        # 空闲超时发送PING探活，上一次PING也没有响应则认为连接已失效
+                        if waiting_pong:
+                            raise redis.TimeoutError('跟踪连接无响应')
+                        await connection.send_command('PING')
+                        waiting_pong = True
+                        continue
+                    waiting_pong = False
+                    if message[0] == 'message':
+                        self.invalidate(message[2])
+            except asyncio.CancelledError:
+                raise
+            except ResponseError:
+                logger.warning('Redis不支持客户端缓存跟踪，近端缓存已禁用')
+                return
+            except Exception:
+                logger.exception('Redis近端缓存跟踪连接中断，5秒后重试')
+            finally:
+                self.enabled = False
+                self.invalidate(None)
+                await connection.disconnect()
+            await asyncio.sleep(5)
+
+
+# Redis连接池，连接用尽时最多等待 REDIS_POOL_TIMEOUT 秒
+redis_pool = MeteredConnectionPool(
     host=settings.REDIS_HOST,
     port=settings.REDIS_PORT,
     db=settings.REDIS_DB,
     password=settings.REDIS_PASSWORD or None,
     decode_responses=True,
-    max_connections=20,
+    max_connections=settings.REDIS_MAX_CONNECTIONS,
+    timeout=settings.REDIS_POOL_TIMEOUT,
+    socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+    socket_connect_timeout=settings.REDIS_CONNECT_TIMEOUT,
+    socket_keepalive=True,
+)
+metrics.gauge('redis.pool.in_use', lambda: len(redis_pool._in_use_connections))
+
+redis_breaker = CircuitBreaker(
+    'redis',
+    window=settings.REDIS_BREAKER_WINDOW_SECONDS,
+    min_calls=settings.REDIS_BREAKER_MIN_CALLS,
+    error_rate=settings.REDIS_BREAKER_ERROR_RATE,
+    slow_call_seconds=settings.REDIS_BREAKER_SLOW_CALL_SECONDS,
+    slow_call_rate=settings.REDIS_BREAKER_SLOW_CALL_RATE,
+    open_seconds=settings.REDIS_BREAKER_OPEN_SECONDS,
 )
 
 # Redis客户端
-redis_client = redis.Redis(connection_pool=redis_pool)
+if settings.REDIS_AUTO_PIPELINE:
+    redis_client: Redis = AutoPipelineRedis(
+        connection_pool=redis_pool,
+        breaker=redis_breaker,
+        pipeline_window=settings.REDIS_PIPELINE_WINDOW_MS / 1000,
+        max_batch=settings.REDIS_PIPELINE_MAX_BATCH,
+    )
+else:
+    redis_client = BreakerRedis(connection_pool=redis_pool, breaker=redis_breaker)
+
+# 近端缓存，REDIS_NEAR_CACHE 关闭时 enabled 始终为 False，读取直接访问Redis
+near_cache = NearCache(
+    settings.REDIS_NEAR_CACHE_PREFIXES, settings.REDIS_NEAR_CACHE_SIZE, settings.REDIS_NEAR_CACHE_TTL
+)
 
 
 async def get_redis() -> Redis:
@@ -28,4 +384,4 @@ async def close_redis():
     """
     关闭Redis连接
     """
-    await redis_client.close()
+    await redis_client.aclose()
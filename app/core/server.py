@@ -1,3 +1,4 @@
+import asyncio
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
@@ -5,14 +6,18 @@ from fastapi.middleware.cors import CORSMiddleware
 
 from app.core import database
 from app.core.config import settings
-from app.core.redis import close_redis
+from app.core.metrics import metrics
+from app.core.redis import close_redis, near_cache, redis_client, redis_pool
 from app.exception import global_excetption_handler
 from app.router import (
     auth_router,
     # menu_router,
     role_router,
     user_router,
+    well_known_router,
 )
+from app.utils.pwd import password_executor
+from app.utils.revocation import revocation_filter
 
 
 @asynccontextmanager
@@ -20,9 +25,18 @@ async def lifespan(app: FastAPI):
     # 启动事件
     if settings.APP_ENV == 'dev' and settings.AUTO_CREATE_TABLE:
         await database.init_create_table()
+    if settings.DB_POOL_WARMUP:
+        await database.warm_up_pools()
+    tasks = [asyncio.create_task(revocation_filter.run(redis_client))]
+    if settings.REDIS_NEAR_CACHE:
+        tasks.append(asyncio.create_task(near_cache.run(redis_pool)))
     yield
     # 关闭事件
+    for task in tasks:
+        task.cancel()
     await close_redis()
+    await database.dispose_engines()
+    password_executor.shutdown()
 
 
 app = FastAPI(lifespan=lifespan)
@@ -42,6 +56,7 @@ port = settings.APP_PORT
 reload = settings.APP_RELOAD
 
 app.include_router(auth_router)
+app.include_router(well_known_router)
 app.include_router(user_router)
 app.include_router(role_router)
 # app.include_router(menu_router)
@@ -50,3 +65,8 @@ app.include_router(role_router)
 @app.get('/')
 async def main():
     return 'FastAPI Demo'
+
+
+@app.get('/metrics')
+async def get_metrics():
+    return metrics.snapshot()
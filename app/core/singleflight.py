@@ -0,0 +1,58 @@
+import asyncio
+from collections.abc import Awaitable, Callable, Hashable
+
+from app.core.metrics import metrics
+
+
+class SingleFlight[K: Hashable, V]:
+    """
+    合并同一worker内相同键的并发加载
+
+    第一个调用执行加载，加载期间到达的相同键的调用等待并共享它的结果（包括异常）；
+    加载完成后不缓存结果，下一次调用重新加载。领头的调用被取消时，等待者之一接替重新加载。
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: dict[K, asyncio.Future[V]] = {}
+        metrics.gauge(f'singleflight.{name}.inflight', lambda: len(self._calls))
+
+    async def do(self, key: K, fn: Callable[[], Awaitable[V]]) -> tuple[V, bool]:
+        """
+        执行或加入键对应的加载
+
+        Args:
+            key: 加载的键
+            fn: 无参异步加载函数
+
+        Returns:
+            加载结果，以及本次调用是否复用了其它调用的结果
+        """
+        while (future := self._calls.get(key)) is not None:
+            metrics.incr(f'singleflight.{self.name}.coalesced')
+            try:
+                # shield 保证等待者自身被取消时不会取消共享的加载
+                return await asyncio.shield(future), True
+            except asyncio.CancelledError:
+                task = asyncio.current_task()
+                if not future.cancelled() or (task is not None and task.cancelling()):
+                    raise
+
+        future = asyncio.get_running_loop().create_future()
+        self._calls[key] = future
+        metrics.incr(f'singleflight.{self.name}.executed')
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # 没有等待者时避免 "exception was never retrieved" 警告
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            if self._calls.get(key) is future:
+                del self._calls[key]
@@ -1,6 +1,7 @@
+import math
 from http import HTTPStatus
 
-from fastapi import FastAPI, HTTPException, Request
+from fastapi import FastAPI, HTTPException, Request, status
 from fastapi.responses import JSONResponse
 from loguru import logger
 from pydantic import ValidationError
@@ -9,6 +10,8 @@ from app.models.response import ResponseCode, ResultResponse
 
 from .service_exception import ServiceException
 
+_RETRYABLE_STATUS = {HTTPStatus.TOO_MANY_REQUESTS, HTTPStatus.SERVICE_UNAVAILABLE}
+
 
 def global_excetption_handler(app: FastAPI):
     @app.exception_handler(ServiceException)
@@ -23,10 +26,31 @@ def global_excetption_handler(app: FastAPI):
     async def http_exception_handler(request: Request, exc: HTTPException):
         logger.info(f'{request.method} {request.url} {exc.status_code} {exc.detail}')
         return JSONResponse(
-            status_code=ResponseCode.SUCCESS,
+            # 限流和服务不可用需要保留HTTP状态码，客户端和代理据此配合 Retry-After 重试
+            status_code=exc.status_code if exc.status_code in _RETRYABLE_STATUS else ResponseCode.SUCCESS,
             content=ResultResponse.error(code=exc.status_code, message=exc.detail).model_dump(),
+            headers=exc.headers,
+        )
+
+    # app.core 包导入时加载服务，服务又导入本模块，因此在注册时再导入
+    from app.core.config import settings
+    from app.core.redis import REDIS_UNAVAILABLE_ERRORS
+
+    async def redis_unavailable_handler(request: Request, exc: Exception):
+        # 与认证依赖的降级响应一致，返回503并提示在熔断打开的时长后重试
+        logger.warning(f'{request.method} {request.url} Redis不可用: {exc!r}')
+        return await http_exception_handler(
+            request,
+            HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail='服务暂不可用',
+                headers={'Retry-After': str(math.ceil(settings.REDIS_BREAKER_OPEN_SECONDS))},
+            ),
         )
 
+    for error in REDIS_UNAVAILABLE_ERRORS:
+        app.add_exception_handler(error, redis_unavailable_handler)
+
     @app.exception_handler(ValidationError)
     async def padantic_validation_exception_handler(request: Request, exc: ValidationError):
         logger.info(f'{request.method} {request.url} {HTTPStatus.BAD_REQUEST} {exc.errors()}')
@@ -31,7 +31,7 @@ class Menu(Base):
         back_populates='menus',
         primaryjoin='Menu.id == role_menu.c.menu_id',
         secondaryjoin='Role.id == role_menu.c.role_id',
-        lazy='selectin',
+        lazy='raise_on_sql',
     )
 
     def __repr__(self) -> str:
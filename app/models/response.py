@@ -24,6 +24,15 @@ class Pagination[T](BaseModel):
         arbitrary_types_allowed = True
 
 
+class CursorPagination[T](BaseModel):
+    page_size: int = Field(default=10)
+    data: list[T] = Field(default_factory=list)
+    next_cursor: str | None = Field(default=None, description='下一页游标，为空表示没有更多数据')
+
+    class Config:
+        arbitrary_types_allowed = True
+
+
 class ResultResponse(BaseModel):
     code: int
     message: str
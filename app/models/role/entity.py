@@ -40,7 +40,7 @@ class Role(Base):
         back_populates='roles',
         primaryjoin='Role.id == role_menu.c.role_id',
         secondaryjoin='Menu.id == role_menu.c.menu_id',
-        lazy='selectin',
+        lazy='raise_on_sql',
     )
 
     users: Mapped[list[User]] = relationship(
@@ -49,7 +49,7 @@ class Role(Base):
         back_populates='roles',
         primaryjoin='Role.id == user_role.c.role_id',
         secondaryjoin='User.id == user_role.c.user_id',
-        lazy='selectin',
+        lazy='raise_on_sql',
     )
 
     def __repr__(self) -> str:
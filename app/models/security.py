@@ -1,4 +1,8 @@
-from pydantic import BaseModel
+from datetime import datetime
+
+from pydantic import BaseModel, PrivateAttr
+
+from app.utils.permission import PermissionMatcher
 
 from .user import PrueUserVO
 
@@ -8,5 +12,22 @@ class SecurityUser(BaseModel):
     roles: list[str] | None = None
     permissions: list[str] | None = None
 
+    # 编译后的权限匹配器，随 SecurityUser 一起缓存，不参与序列化
+    _matcher: PermissionMatcher | None = PrivateAttr(default=None)
+
     class Config:
         from_attributes = True
+
+    @property
+    def permission_matcher(self) -> PermissionMatcher:
+        if self._matcher is None:
+            self._matcher = PermissionMatcher(self.permissions or [])
+        return self._matcher
+
+
+class SessionVO(BaseModel):
+    session_id: str
+    device: str | None = None
+    created_at: datetime
+    expires_at: datetime
+    current: bool = False
@@ -37,7 +37,7 @@ class User(Base):
         back_populates='users',
         primaryjoin='User.id == user_role.c.user_id',
         secondaryjoin='Role.id == user_role.c.role_id',
-        lazy='selectin',
+        lazy='raise_on_sql',
     )
 
     def __repr__(self) -> str:
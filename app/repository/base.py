@@ -1,44 +1,248 @@
-from datetime import datetime
-from typing import Any
+import base64
+import json
+import uuid
+from collections.abc import AsyncIterator, Sequence
+from datetime import date, datetime
+from enum import StrEnum
+from typing import Any, ClassVar, get_args, get_origin
 
 from pydantic import BaseModel
-from sqlalchemy import func, insert, select, update
+from sqlalchemy import Row, Select, bindparam, func, insert, inspect, select, text, tuple_, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import InvalidRequestError
 from sqlalchemy.ext.asyncio import AsyncSession
-
+from sqlalchemy.orm import selectinload
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.orm.interfaces import ORMOption
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.core.database import after_commit, is_read_only
+from app.core.singleflight import SingleFlight
+from app.exception import ServiceException
 from app.models.base import Base
-from app.models.response import Pagination
+from app.models.response import CursorPagination, Pagination
+
+
+def _encode_cursor(sort_value: Any, id: int) -> str:
+    if isinstance(sort_value, date):
+        sort_value = sort_value.isoformat()
+    raw = json.dumps([sort_value, id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def _decode_cursor(cursor: str, sort_column) -> tuple[Any, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        sort_value, id = json.loads(raw)
+        python_type = sort_column.type.python_type
+        if python_type in (datetime, date) and sort_value is not None:
+            sort_value = python_type.fromisoformat(sort_value)
+        return sort_value, int(id)
+    except (ValueError, TypeError):
+        raise ServiceException(code=400, message='无效的分页游标')
+
+
+class LoadProfile(StrEnum):
+    """
+    关联关系加载方案，由调用方按所需VO选择，避免级联加载整张关系图
+    """
+
+    NONE = 'none'  # 只加载本表字段
+    ROLES = 'roles'  # 加载角色
+    AUTH = 'auth'  # 加载角色及菜单，用于认证鉴权
+    FULL = 'full'  # 加载VO展示所需的全部关联
+
+
+class CountStrategy(StrEnum):
+    """
+    分页总数统计方式
+    """
+
+    EXACT = 'exact'  # 每次精确count
+    CACHED = 'cached'  # 精确count结果缓存TTL秒，通过仓储增删时失效
+    ESTIMATED = 'estimated'  # 使用pg_class.reltuples估算，适合超大表，包含软删除数据
+
+
+# 精确总数缓存，按表名存储，多个仓储实例共享
+_count_cache: LRUCache[str, int] = LRUCache(maxsize=256, ttl=settings.COUNT_CACHE_TTL)
+# 合并不同请求在同一数据库上对同一实体的并发 get_by_id，键为 (engine, 表名, ID, 加载方案)
+_get_by_id_flight: SingleFlight[tuple[Any, str, int, LoadProfile], Any] = SingleFlight('repository.get_by_id')
+
+
+class _QueryTemplates:
+    """
+    模型的预构建查询语句
+
+    按字段和加载方案各构建一次，查询值通过绑定参数传入。语句对象会记住自己的缓存键，
+    复用时既不重建语句，也不重新遍历语句计算编译缓存的键。
+    """
+
+    def __init__(self, clazz: type[Base], load_options: dict[LoadProfile, Sequence[ORMOption]]):
+        self.clazz = clazz
+        mapper = inspect(clazz)
+        self.fields = frozenset(mapper.column_attrs.keys())
+        self.has_deleted_at = 'deleted_at' in self.fields
+        # 非空列才能作为游标分页的排序字段，NULL 参与行值比较的结果为NULL，对应的行会被跳过
+        self.non_nullable = frozenset(
+            key for key, attr in mapper.column_attrs.items() if not getattr(attr.columns[0], 'nullable', True)
+        )
+
+        self.count = self._alive(select(func.count()).select_from(clazz))
+        # 按加载方案的全表查询
+        self.select: dict[LoadProfile, Select] = {
+            profile: self._alive(select(clazz).options(*load_options.get(profile, ()))) for profile in LoadProfile
+        }
+        # 按 (字段, 加载方案) 的等值查询，以及只查主键的等值查询
+        self.select_by: dict[tuple[str, LoadProfile], Select] = {}
+        self.select_id_by: dict[str, Select] = {}
+        for field in self.fields:
+            condition = getattr(clazz, field) == bindparam('field_value')
+            for profile, query in self.select.items():
+                self.select_by[(field, profile)] = query.where(condition)
+            self.select_id_by[field] = self._alive(select(clazz.id).where(condition))  # type: ignore
+
+    def _alive(self, query: Select) -> Select:
+        if self.has_deleted_at:
+            return query.where(self.clazz.deleted_at.is_(None))  # type: ignore
+        return query
+
+    def check_field(self, field_name: str):
+        if field_name not in self.fields:
+            raise ServiceException(code=400, message=f'不支持的字段: {field_name}')
+
+    def by_field(self, field_name: str, field_value: Any, profile: LoadProfile) -> tuple[Select, dict[str, Any]]:
+        """
+        按字段等值查询的语句和参数，值为None时改用 IS NULL（= NULL 不匹配任何行）
+        """
+        self.check_field(field_name)
+        if field_value is None:
+            return self.select[profile].where(getattr(self.clazz, field_name).is_(None)), {}
+        return self.select_by[(field_name, profile)], {'field_value': field_value}
+
+    def id_by_field(self, field_name: str, field_value: Any) -> tuple[Select, dict[str, Any]]:
+        """
+        按字段等值只查主键的语句和参数，值为None时改用 IS NULL
+        """
+        self.check_field(field_name)
+        if field_value is None:
+            return self._alive(select(self.clazz.id).where(getattr(self.clazz, field_name).is_(None))), {}  # type: ignore
+        return self.select_id_by[field_name], {'field_value': field_value}
 
 
 class BaseRepository[Clazz: Base]:
+    # 各加载方案对应的loader选项，由子类按模型关系声明，未声明的方案不加载关联
+    load_options: ClassVar[dict[LoadProfile, Sequence[ORMOption]]] = {}
+    # 分页默认的总数统计方式，可在子类覆盖或调用时指定
+    count_strategy: ClassVar[CountStrategy] = CountStrategy.EXACT
+    # 预构建的查询语句，在子类定义时根据 BaseRepository[Model] 的模型参数生成
+    _templates: ClassVar[_QueryTemplates | None] = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        for base in getattr(cls, '__orig_bases__', ()):
+            origin, args = get_origin(base), get_args(base)
+            if isinstance(origin, type) and issubclass(origin, BaseRepository) and args:
+                if isinstance(args[0], type) and issubclass(args[0], Base):
+                    cls._templates = _QueryTemplates(args[0], cls.load_options)
+                break
+
     def __init__(self, clazz: type[Clazz], db: AsyncSession):
         self.db = db
         self.clazz = clazz
+        templates = type(self)._templates
+        if templates is None or templates.clazz is not clazz:
+            templates = _QueryTemplates(clazz, self.load_options)
+        self.templates = templates
+
+    def _init_collections(self, instance: Clazz):
+        """
+        新建实体的集合关系必然为空，直接标记为已加载，避免访问时触发懒加载
+        """
+        state = inspect(instance)
+        for relationship in state.mapper.relationships:
+            if relationship.uselist and relationship.key in state.unloaded:
+                set_committed_value(instance, relationship.key, [])
+
+    def _invalidate_count(self):
+        """
+        数据增删后使总数缓存失效，提交后再失效一次，避免并发请求在提交前缓存旧值
+        """
+        table_name = self.clazz.__tablename__
+
+        async def invalidate():
+            _count_cache.pop(table_name)
+
+        _count_cache.pop(table_name)
+        after_commit(self.db, invalidate)
+
+    async def count(self, strategy: CountStrategy | None = None) -> int:
+        """
+        统计未删除的实体数量
+
+        Args:
+            strategy: 统计方式，不传使用仓储默认方式
+
+        Returns:
+            实体数量
+        """
+        strategy = strategy or self.count_strategy
+        table = self.clazz.__table__
+
+        if strategy == CountStrategy.ESTIMATED:
+            estimate = await self.db.scalar(
+                text('SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:table)'),
+                {'table': f'"{table.schema}"."{table.name}"' if table.schema else f'"{table.name}"'},
+            )
+            # 从未ANALYZE过的表reltuples为-1，退回精确统计
+            if estimate is not None and estimate >= 0:
+                return estimate
+
+        if strategy == CountStrategy.CACHED and (cached := _count_cache.get(table.name)) is not None:
+            return cached
+
+        total = await self.db.scalar(self.templates.count) or 0
+
+        if strategy == CountStrategy.CACHED:
+            _count_cache.set(table.name, total)
+        return total
 
-    async def get_by_id(self, id: int) -> Clazz | None:
+    async def get_by_id(self, id: int, profile: LoadProfile = LoadProfile.NONE) -> Clazz | None:
         """
-        根据ID获取实体
+        根据ID获取实体，只读会话中同一worker内对同一实体的并发查询只执行一次
 
         Args:
             id: 实体ID
+            profile: 关联关系加载方案
 
         Returns:
             实体对象或None
         """
-        # 检查模型是否有deleted_at字段
-        has_deleted_at = hasattr(self.clazz, 'deleted_at')
+        # 主库会话可能已写入或随后基于结果写入，也可能是为读到自己的写入而路由到主库，必须读自己的事务
+        if not is_read_only(self.db):
+            return await self._get_by_id(id, profile)
 
-        if has_deleted_at:
-            result = await self.db.scalar(
-                select(self.clazz).where((self.clazz.id == id) & (self.clazz.deleted_at.is_(None)))
-            )
-        else:
-            result = await self.db.scalar(select(self.clazz).where(self.clazz.id == id))
-        return result
+        # 只与同一数据库上的只读会话合并，避免读到其它副本的结果
+        result, shared = await _get_by_id_flight.do(
+            (self.db.bind, self.clazz.__tablename__, id, profile), lambda: self._get_by_id(id, profile)
+        )
+        if not shared or result is None:
+            return result
+        try:
+            # 结果属于领头请求的会话，无SQL地合并到当前会话；对方已修改该对象时重新查询
+            return await self.db.merge(result, load=False)
+        except InvalidRequestError:
+            return await self._get_by_id(id, profile)
+
+    async def _get_by_id(self, id: int, profile: LoadProfile) -> Clazz | None:
+        return await self.db.scalar(self.templates.select_by[('id', profile)], {'field_value': id})
 
     async def create(self, create_dto: BaseModel) -> Clazz:
         instance = self.clazz(**create_dto.model_dump())
         self.db.add(instance)
         await self.db.flush()
+        self._init_collections(instance)
+        self._invalidate_count()
         return instance
 
     async def create_with_insert(self, create_dto: BaseModel) -> Clazz:
@@ -54,20 +258,138 @@ class BaseRepository[Clazz: Base]:
         # 获取模型数据
         data = create_dto.model_dump()
 
-        # 执行insert语句
-        stmt = insert(self.clazz).values(**data)
-        result = await self.db.execute(stmt)
-
-        # 获取插入的记录ID
-        inserted_id = result.inserted_primary_key[0]  # type: ignore
-
-        # 查询并返回插入的实体
-        instance = await self.get_by_id(inserted_id)
+        # 执行 INSERT ... RETURNING，一次往返直接得到插入后的实体
+        stmt = insert(self.clazz).values(**data).returning(self.clazz)
+        instance = await self.db.scalar(stmt)
         if instance is None:
             # 这种情况理论上不会发生，但为了类型检查需要处理
             raise Exception('Failed to retrieve inserted entity')
+        self._init_collections(instance)
+        self._invalidate_count()
         return instance
 
+    def _bulk_rows(self, create_dtos: Sequence[BaseModel]) -> tuple[list[str], list[dict[str, Any]]]:
+        """
+        将DTO转换为统一列集合的行数据，并补齐Python端默认值（COPY不会执行这些默认值）
+        """
+        table = self.clazz.__table__
+        defaults = {}
+        for column in table.columns:
+            default = column.default
+            if column.primary_key or default is None:
+                continue
+            if default.is_callable:
+                defaults[column.name] = default.arg(None)  # type: ignore
+            elif default.is_scalar:
+                defaults[column.name] = default.arg  # type: ignore
+
+        rows = []
+        for dto in create_dtos:
+            row = {key: value for key, value in dto.model_dump().items() if key in table.columns}
+            for key, value in defaults.items():
+                if row.get(key) is None:
+                    row[key] = value
+            rows.append(row)
+        columns = list(rows[0]) if rows else []
+        return columns, rows
+
+    async def bulk_create(self, create_dtos: Sequence[BaseModel]) -> int:
+        """
+        批量创建实体
+
+        Args:
+            create_dtos: 创建数据传输对象列表
+
+        Returns:
+            插入的行数
+        """
+        return await self.bulk_upsert(create_dtos, index_elements=None)
+
+    async def bulk_upsert(
+        self,
+        create_dtos: Sequence[BaseModel],
+        index_elements: Sequence[str] | None,
+        update_fields: Sequence[str] | None = None,
+    ) -> int:
+        """
+        批量插入，唯一键冲突时忽略或更新指定字段
+
+        行数较少时使用多行INSERT（executemany），达到 BULK_COPY_THRESHOLD 时
+        通过asyncpg COPY写入临时表，再 INSERT ... SELECT 到目标表。
+        冲突时更新的情况下，同一批内唯一键重复的行只保留最后一行，否则同一行在一条语句中会被更新两次而报错。
+
+        Args:
+            create_dtos: 创建数据传输对象列表
+            index_elements: 冲突判断的唯一键列，如 ['username']，为None时不处理冲突
+            update_fields: 冲突时需要更新的字段，为空则忽略冲突行
+
+        Returns:
+            插入或更新的行数
+        """
+        columns, rows = self._bulk_rows(create_dtos)
+        if not rows:
+            return 0
+        self._invalidate_count()
+        if len(rows) >= settings.BULK_COPY_THRESHOLD:
+            return await self._bulk_copy(columns, rows, index_elements, update_fields)
+
+        table = self.clazz.__table__
+        stmt = pg_insert(table)
+        if index_elements and update_fields:
+            rows = list({tuple(row[key] for key in index_elements): row for row in rows}.values())
+            stmt = stmt.on_conflict_do_update(
+                index_elements=index_elements, set_={field: stmt.excluded[field] for field in update_fields}
+            )
+        elif index_elements:
+            stmt = stmt.on_conflict_do_nothing(index_elements=index_elements)
+        result = await self.db.execute(stmt.returning(table.c.id), rows)
+        return len(result.all())
+
+    async def _bulk_copy(
+        self,
+        columns: list[str],
+        rows: list[dict[str, Any]],
+        index_elements: Sequence[str] | None,
+        update_fields: Sequence[str] | None,
+    ) -> int:
+        table = self.clazz.__table__
+        conn = await self.db.connection()
+        preparer = conn.dialect.identifier_preparer
+        target = preparer.format_table(table)
+        column_list = ', '.join(preparer.quote(column) for column in columns)
+        temp_name = f'bulk_{table.name}_{uuid.uuid4().hex[:8]}'
+
+        # 临时表只复制列类型不复制约束，随事务提交删除；bulk_ord 记录行在批次中的顺序，用于重复键去重
+        await conn.execute(
+            text(
+                f'CREATE TEMP TABLE {temp_name} ON COMMIT DROP AS '
+                f'SELECT {column_list}, 0::bigint AS bulk_ord FROM {target} WITH NO DATA'
+            )
+        )
+        raw_connection = await conn.get_raw_connection()
+        await raw_connection.driver_connection.copy_records_to_table(  # type: ignore
+            temp_name,
+            records=[(*(row[column] for column in columns), ordinal) for ordinal, row in enumerate(rows)],
+            columns=[*columns, 'bulk_ord'],
+        )
+
+        source = f'SELECT {column_list} FROM {temp_name}'
+        conflict = ''
+        if index_elements:
+            conflict_keys = ', '.join(preparer.quote(key) for key in index_elements)
+            if update_fields:
+                # 同一唯一键只保留批次中的最后一行
+                source = (
+                    f'SELECT DISTINCT ON ({conflict_keys}) {column_list} FROM {temp_name} '
+                    f'ORDER BY {conflict_keys}, bulk_ord DESC'
+                )
+                assignments = ', '.join(f'{preparer.quote(f)} = EXCLUDED.{preparer.quote(f)}' for f in update_fields)
+                conflict = f' ON CONFLICT ({conflict_keys}) DO UPDATE SET {assignments}'
+            else:
+                conflict = f' ON CONFLICT ({conflict_keys}) DO NOTHING'
+        result = await conn.execute(text(f'INSERT INTO {target} ({column_list}) {source}{conflict}'))
+        return result.rowcount
+
     async def update(self, update_dto: BaseModel) -> Clazz | None:
         """
         更新实体
@@ -79,17 +401,20 @@ class BaseRepository[Clazz: Base]:
             更新后的实体对象或None
         """
         dto = update_dto.model_dump(exclude_unset=True)
-        id = dto.get('id')
+        id = dto.pop('id', None)
         if id is None:
             return None
-        instance = await self.get_by_id(id)
-        dto.pop('id', None)
-        if instance:
-            for key, value in dto.items():
-                # 只有当值不是None时才更新字段
-                if value is not None:
-                    setattr(instance, key, value)
-        return instance
+        # 只有当值不是None时才更新字段
+        values = {key: value for key, value in dto.items() if value is not None}
+        if not values:
+            return await self.get_by_id(id)
+
+        # 单条 UPDATE ... RETURNING，无需先查询实体
+        stmt = update(self.clazz).where(self.clazz.id == id)
+        if self.templates.has_deleted_at:
+            stmt = stmt.where(self.clazz.deleted_at.is_(None))
+        stmt = stmt.values(**values).returning(self.clazz).execution_options(populate_existing=True)
+        return await self.db.scalar(stmt)
 
     async def delete(self, id: int) -> bool:
         """
@@ -103,6 +428,7 @@ class BaseRepository[Clazz: Base]:
         instance = await self.get_by_id(id)
         if instance and hasattr(instance, 'deleted_at'):
             setattr(instance, 'deleted_at', datetime.now())
+            self._invalidate_count()
             return True
         return False
 
@@ -116,80 +442,89 @@ class BaseRepository[Clazz: Base]:
         Returns:
             删除是否成功
         """
-        instance = await self.get_by_id(id)
+        # 删除多对多关系时需要已加载的集合来清理中间表
+        relationships = inspect(self.clazz).relationships
+        instance = await self.db.scalar(
+            select(self.clazz)
+            .where(self.clazz.id == id)
+            .options(*[selectinload(getattr(self.clazz, rel.key)) for rel in relationships])
+        )
         if instance:
             await self.db.delete(instance)
+            self._invalidate_count()
             return True
         return False
 
-    async def get_one_by_field(self, field_name: str, field_value: Any) -> Clazz | None:
+    async def get_one_by_field(
+        self, field_name: str, field_value: Any, profile: LoadProfile = LoadProfile.NONE
+    ) -> Clazz | None:
         """
         根据字段名和字段值获取实体
 
         Args:
             field_name: 字段名
             field_value: 字段值
+            profile: 关联关系加载方案
 
         Returns:
             实体对象或None
         """
-        # 检查模型是否有deleted_at字段
-        has_deleted_at = hasattr(self.clazz, 'deleted_at')
+        return await self.db.scalar(*self.templates.by_field(field_name, field_value, profile))
 
-        if has_deleted_at:
-            result = await self.db.scalar(
-                select(self.clazz).where(
-                    (getattr(self.clazz, field_name) == field_value) & (self.clazz.deleted_at.is_(None))
-                )
-            )
-        else:
-            result = await self.db.scalar(select(self.clazz).where(getattr(self.clazz, field_name) == field_value))
-        return result
+    async def get_id_by_field(self, field_name: str, field_value: Any) -> int | None:
+        """
+        只查询主键，用于存在性检查，不加载实体
+
+        Args:
+            field_name: 字段名（应为有索引的列）
+            field_value: 字段值
 
-    async def get_all_by_field(self, field_name: str, field_value: Any) -> list[Clazz]:
+        Returns:
+            实体ID或None
+        """
+        return await self.db.scalar(*self.templates.id_by_field(field_name, field_value))
+
+    async def get_all_by_field(
+        self, field_name: str, field_value: Any, profile: LoadProfile = LoadProfile.NONE
+    ) -> list[Clazz]:
         """
         根据字段名和字段值获取所有匹配的实体列表
 
         Args:
             field_name: 字段名
             field_value: 字段值
+            profile: 关联关系加载方案
 
         Returns:
             匹配的实体对象列表
         """
-        has_deleted_at = hasattr(self.clazz, 'deleted_at')
-
-        if has_deleted_at:
-            records = await self.db.scalars(
-                select(self.clazz).where(
-                    (getattr(self.clazz, field_name) == field_value) & (self.clazz.deleted_at.is_(None))
-                )
-            )
-        else:
-            records = await self.db.scalars(select(self.clazz).where(getattr(self.clazz, field_name) == field_value))
+        records = await self.db.scalars(*self.templates.by_field(field_name, field_value, profile))
         return list(records.all())
 
-    async def paginate(self, page_index: int = 1, page_size: int = 10) -> Pagination[Clazz]:
+    async def paginate(
+        self,
+        page_index: int = 1,
+        page_size: int = 10,
+        profile: LoadProfile = LoadProfile.NONE,
+        count_strategy: CountStrategy | None = None,
+    ) -> Pagination[Clazz]:
         """
         分页查询
 
         Args:
             page_index: 页码（从1开始）
             page_size: 每页大小
+            profile: 关联关系加载方案
+            count_strategy: 总数统计方式，不传使用仓储默认方式
 
         Returns:
             包含数据和分页信息的字典
         """
         offset = (page_index - 1) * page_size
-
-        # 检查模型是否有deleted_at字段
-        has_deleted_at = hasattr(self.clazz, 'deleted_at')
-
-        query = select(self.clazz).where(self.clazz.deleted_at.is_(None)) if has_deleted_at else select(self.clazz)
+        query = self.templates.select[profile]
 
         # 获取总数量
-        total_query = select(func.count()).select_from(self.clazz)
-        total = await self.db.scalar(total_query) or 0
+        total = await self.count(count_strategy)
 
         # 获取数据
         result = await self.db.scalars(query.offset(offset).limit(page_size))
@@ -197,11 +532,74 @@ class BaseRepository[Clazz: Base]:
         return Pagination(
             data=data,
             total=total,
-            page=page_index,
-            size=page_size,
+            page_index=page_index,
+            page_size=page_size,
             pages=(total + page_size - 1) // page_size if page_size > 0 else 0,
         )
 
+    async def paginate_by_cursor(
+        self,
+        cursor: str | None = None,
+        page_size: int = 10,
+        sort_key: str = 'id',
+        profile: LoadProfile = LoadProfile.NONE,
+    ) -> CursorPagination[Clazz]:
+        """
+        游标（keyset）分页查询，按 (sort_key, id) 定位，耗时与页深无关
+
+        Args:
+            cursor: 上一页返回的 next_cursor，为空表示第一页
+            page_size: 每页大小
+            sort_key: 排序字段，必须为非空列，并应有索引
+            profile: 关联关系加载方案
+
+        Returns:
+            包含数据和下一页游标的分页结果
+        """
+        if sort_key not in self.templates.fields:
+            raise ServiceException(code=400, message=f'不支持的排序字段: {sort_key}')
+        if sort_key not in self.templates.non_nullable:
+            raise ServiceException(code=400, message=f'可为空的字段不能作为排序字段: {sort_key}')
+        sort_column = getattr(self.clazz, sort_key)
+        query = self.templates.select[profile]
+
+        if cursor:
+            sort_value, last_id = _decode_cursor(cursor, sort_column)
+            if sort_key == 'id':
+                query = query.where(self.clazz.id > last_id)
+            else:
+                query = query.where(tuple_(sort_column, self.clazz.id) > tuple_(sort_value, last_id))
+
+        # 多取一条用于判断是否还有下一页
+        result = await self.db.scalars(query.order_by(sort_column, self.clazz.id).limit(page_size + 1))
+        data = list(result.all())
+
+        next_cursor = None
+        if len(data) > page_size:
+            data = data[:page_size]
+            last = data[-1]
+            next_cursor = _encode_cursor(getattr(last, sort_key), last.id)
+        return CursorPagination(data=data, page_size=page_size, next_cursor=next_cursor)
+
+    async def stream_rows(self, columns: Sequence[str], batch_size: int = 1000) -> AsyncIterator[Row]:
+        """
+        通过服务端游标按批流式读取指定列，内存占用与表大小无关
+
+        Args:
+            columns: 列名列表
+            batch_size: 每批从数据库拉取的行数
+
+        Returns:
+            行数据异步迭代器
+        """
+        for column in columns:
+            self.templates.check_field(column)
+        query = self.templates._alive(select(*[getattr(self.clazz, column) for column in columns]))
+        query = query.order_by(self.clazz.id)
+        result = await self.db.stream(query.execution_options(yield_per=batch_size))
+        async for row in result:
+            yield row
+
     async def batch_delete(self, ids: list[int]) -> bool:
         """
         批量删除实体
@@ -215,8 +613,8 @@ class BaseRepository[Clazz: Base]:
         if not ids:
             return False
 
-        has_deleted_at = hasattr(self.clazz, 'deleted_at')
-        if has_deleted_at:
+        self._invalidate_count()
+        if self.templates.has_deleted_at:
             result = await self.db.execute(
                 update(self.clazz).where(self.clazz.id.in_(ids)).values(deleted_at=datetime.now())
             )
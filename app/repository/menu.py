@@ -2,7 +2,7 @@ from fastapi import Depends
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.database import get_db
+from app.core.database import get_routed_db
 from app.models.menu import Menu
 
 from .base import BaseRepository
@@ -20,5 +20,5 @@ class MenuRepository(BaseRepository[Menu]):
         return list(records)
 
 
-async def get_menu_repository(db: AsyncSession = Depends(get_db)) -> MenuRepository:
+async def get_menu_repository(db: AsyncSession = Depends(get_routed_db)) -> MenuRepository:
     return MenuRepository(db)
@@ -1,14 +1,20 @@
 from fastapi import Depends
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 
-from app.core.database import get_db
+from app.core.database import get_routed_db
 from app.models.role import Role
 
-from .base import BaseRepository
+from .base import BaseRepository, LoadProfile
 
 
 class RoleRepository(BaseRepository[Role]):
+    load_options = {
+        LoadProfile.AUTH: (selectinload(Role.menus),),
+        LoadProfile.FULL: (selectinload(Role.menus),),
+    }
+
     def __init__(self, db: AsyncSession):
         super().__init__(Role, db)
 
@@ -20,5 +26,5 @@ class RoleRepository(BaseRepository[Role]):
         return list(records)
 
 
-async def get_role_repository(db: AsyncSession = Depends(get_db)) -> RoleRepository:
+async def get_role_repository(db: AsyncSession = Depends(get_routed_db)) -> RoleRepository:
     return RoleRepository(db)
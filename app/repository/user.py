@@ -1,16 +1,32 @@
 from fastapi import Depends
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 
-from app.core.database import get_db
+from app.core.database import get_db, get_routed_db
+from app.models.role import Role
 from app.models.user import User
 
-from .base import BaseRepository
+from .base import BaseRepository, CountStrategy, LoadProfile
 
 
 class UserRepository(BaseRepository[User]):
+    load_options = {
+        LoadProfile.ROLES: (selectinload(User.roles),),
+        LoadProfile.AUTH: (selectinload(User.roles).selectinload(Role.menus),),
+        LoadProfile.FULL: (selectinload(User.roles).selectinload(Role.menus),),
+    }
+    count_strategy = CountStrategy.CACHED
+
     def __init__(self, db: AsyncSession):
         super().__init__(User, db)
 
 
-async def get_user_repository(db: AsyncSession = Depends(get_db)) -> UserRepository:
+async def get_user_repository(db: AsyncSession = Depends(get_routed_db)) -> UserRepository:
+    return UserRepository(db)
+
+
+async def get_primary_user_repository(db: AsyncSession = Depends(get_db)) -> UserRepository:
+    """
+    始终使用主库的用户仓库，用于认证：认证用户会写入缓存，不能读到副本上的旧数据
+    """
     return UserRepository(db)
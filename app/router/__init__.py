@@ -1,4 +1,5 @@
 from .auth import router as auth_router
+from .auth import well_known_router
 from .role import router as role_router
 from .user import router as user_router
 
@@ -6,4 +7,5 @@ __all__ = [
     'user_router',
     'auth_router',
     'role_router',
+    'well_known_router',
 ]
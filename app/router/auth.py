@@ -1,27 +1,38 @@
 from datetime import datetime
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from fastapi.security import OAuth2PasswordRequestForm
 
+from app.core.config import settings
+from app.core.database import ReleaseSessionRoute
+from app.core.deps import get_current_user, oauth2_scheme
 from app.core.redis import get_redis
 from app.exception import ServiceException
 from app.models.response import ResultResponse, TokenResponse
+from app.models.security import SecurityUser
 from app.models.user import UserLoginDTO
 from app.service import AuthService, get_auth_service
+from app.service.rate_limit import login_rate_limiter
 from app.utils.jwt import (
     add_token_to_blacklist,
     decode_token,
+    key_ring,
 )
 
-router = APIRouter(prefix='/api/v1/auth', tags=['auth'])
+router = APIRouter(prefix='/api/v1/auth', tags=['auth'], route_class=ReleaseSessionRoute)
+well_known_router = APIRouter(prefix='/.well-known', tags=['auth'])
 
 AuthServiceDep = Annotated[AuthService, Depends(get_auth_service)]
 
 
 @router.post('/login', response_model=TokenResponse, summary='用户登录', description='用户登录')
-async def login(user: UserLoginDTO, auth_service: AuthServiceDep):
-    token: TokenResponse | None = await auth_service.authenticate_user(user.username, user.password)
+async def login(request: Request, user: UserLoginDTO, auth_service: AuthServiceDep, redis=Depends(get_redis)):
+    # 限流必须在查库和校验密码之前
+    await login_rate_limiter.check(redis, user.username, request.client.host if request.client else None)
+    token: TokenResponse | None = await auth_service.authenticate_user(
+        user.username, user.password, request.headers.get('user-agent')
+    )
     if token:
         return token
     raise HTTPException(
@@ -47,7 +58,10 @@ async def login_swagger(
     password = form_data.password
     if username is None or password is None:
         raise ServiceException(code=400, message='用户名或密码不能为空')
-    token: TokenResponse | None = await auth_service.authenticate_user(username, password)
+    await login_rate_limiter.check(redis, username, request.client.host if request.client else None)
+    token: TokenResponse | None = await auth_service.authenticate_user(
+        username, password, request.headers.get('user-agent')
+    )
     if token:
         return token
     raise HTTPException(
@@ -72,9 +86,9 @@ async def refresh_token(refresh_token: str, auth_service: AuthServiceDep, redis=
 
 
 @router.post('/logout', response_model=ResultResponse, summary='退出登录', description='退出登录')
-async def logout(refresh_token: str, redis=Depends(get_redis)):
+async def logout(refresh_token: str, auth_service: AuthServiceDep, redis=Depends(get_redis)):
     """
-    登出用户，将刷新令牌加入黑名单
+    登出用户，删除当前会话并将刷新令牌加入黑名单，该会话的无状态访问令牌随之失效
     """
     # 解码刷新令牌以获取过期时间
     payload = await decode_token(refresh_token)
@@ -94,4 +108,45 @@ async def logout(refresh_token: str, redis=Depends(get_redis)):
             expires_delta = expires_at - now
             await add_token_to_blacklist(redis, refresh_token, expires_delta)
 
+    user_id, username, session_id = payload.get('uid'), payload.get('subject'), payload.get('sid')
+    if user_id and username and session_id:
+        await auth_service.revoke_session(user_id, username, session_id)
+
     return ResultResponse.success(message='登出成功')
+
+
+@router.get('/sessions', response_model=ResultResponse, summary='登录会话', description='查看当前用户的所有登录会话')
+async def sessions(
+    token: Annotated[str, Depends(oauth2_scheme)],
+    user: Annotated[SecurityUser, Depends(get_current_user)],
+    auth_service: AuthServiceDep,
+):
+    payload = await decode_token(token)
+    current_session_id = payload.get('sid') if payload else None
+    data = await auth_service.get_sessions(user.user.id, current_session_id)
+    return ResultResponse.success(data=data)
+
+
+@router.post(
+    '/sessions/revoke_all',
+    response_model=ResultResponse,
+    summary='退出所有设备',
+    description='吊销当前用户的所有登录会话',
+)
+async def revoke_all_sessions(
+    user: Annotated[SecurityUser, Depends(get_current_user)],
+    auth_service: AuthServiceDep,
+):
+    await auth_service.revoke_all_sessions(user.user.id, user.user.username)
+    return ResultResponse.success(message='已退出所有设备')
+
+
+@well_known_router.get('/jwks.json', summary='JWKS公钥', description='供其它服务本地验证访问令牌的公钥集合')
+async def jwks(request: Request):
+    headers = {
+        'Cache-Control': f'public, max-age={settings.JWKS_MAX_AGE}',
+        'ETag': key_ring.jwks_etag,
+    }
+    if request.headers.get('if-none-match') == key_ring.jwks_etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=key_ring.jwks, media_type='application/json', headers=headers)
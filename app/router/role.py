@@ -2,12 +2,13 @@ from typing import Annotated
 
 from fastapi import APIRouter, Depends
 
+from app.core.database import ReleaseSessionRoute
 from app.core.deps import has_authority
 from app.models.response import ResultResponse
 from app.models.role import RoleCreateDTO, RoleUpdateDTO, RoleVO
 from app.service import RoleService, get_role_service
 
-router = APIRouter(prefix='/api/v1/role', tags=['role'])
+router = APIRouter(prefix='/api/v1/role', tags=['role'], route_class=ReleaseSessionRoute)
 
 
 RoleServiceDep = Annotated[RoleService, Depends(get_role_service)]
@@ -1,13 +1,16 @@
-from typing import Annotated
+from typing import Annotated, Literal
 
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Body, Depends, Query
+from fastapi.responses import StreamingResponse
 
+from app.core.config import settings
+from app.core.database import ReleaseSessionRoute
 from app.core.deps import has_authority
 from app.models.response import ResultResponse
 from app.models.user import PassWordChangeDTO, UserCreateDTO, UserUpdateDTO, UserVO
 from app.service import UserService, get_user_service
 
-router = APIRouter(prefix='/api/v1/user', tags=['user'])
+router = APIRouter(prefix='/api/v1/user', tags=['user'], route_class=ReleaseSessionRoute)
 
 UserServiceDep = Annotated[UserService, Depends(get_user_service)]
 
@@ -22,12 +25,36 @@ UserServiceDep = Annotated[UserService, Depends(get_user_service)]
 async def get_users(
     user_service: UserServiceDep,
     page_index: Annotated[int, Query(ge=1)] = 1,
-    page_size: Annotated[int, Query(ge=1)] = 10,
+    page_size: Annotated[int, Query(ge=1, le=100)] = 10,
+    cursor: Annotated[
+        str | None, Query(description='游标分页：首页传空字符串，之后传上一页返回的 next_cursor，传入时忽略 page_index')
+    ] = None,
 ):
-    users = await user_service.get_users(page_index, page_size)
+    if cursor is not None:
+        users = await user_service.get_users_by_cursor(cursor or None, page_size)
+    else:
+        users = await user_service.get_users(page_index, page_size)
     return ResultResponse.success(data=users)
 
 
+@router.get(
+    '/export',
+    dependencies=[Depends(has_authority('sys:user:list'))],
+    summary='导出用户',
+    description='流式导出全部用户，支持 ndjson 和 csv 格式',
+)
+async def export_users(
+    user_service: UserServiceDep,
+    format: Annotated[Literal['ndjson', 'csv'], Query()] = 'ndjson',
+):
+    media_type = 'text/csv; charset=utf-8' if format == 'csv' else 'application/x-ndjson'
+    return StreamingResponse(
+        user_service.export_users(format),
+        media_type=media_type,
+        headers={'Content-Disposition': f'attachment; filename=users.{format}'},
+    )
+
+
 @router.get(
     '/{user_id}',
     response_model=ResultResponse,
@@ -52,6 +79,20 @@ async def add_user(user: UserCreateDTO, user_service: UserServiceDep):
     return ResultResponse.success(data=new_user) if new_user else ResultResponse.error(message='添加用户失败')
 
 
+@router.post(
+    '/bulk',
+    response_model=ResultResponse,
+    dependencies=[Depends(has_authority('sys:user:create'))],
+    summary='批量添加用户',
+    description=f'批量添加用户，用户名已存在的记录会被跳过，单次最多 {settings.USER_BULK_MAX_SIZE} 条',
+)
+async def bulk_add_users(
+    users: Annotated[list[UserCreateDTO], Body(max_length=settings.USER_BULK_MAX_SIZE)], user_service: UserServiceDep
+):
+    created = await user_service.bulk_add_users(users)
+    return ResultResponse.success(data={'created': created, 'skipped': len(users) - created})
+
+
 @router.put(
     '/',
     response_model=ResultResponse,
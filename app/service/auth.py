@@ -1,29 +1,46 @@
+import asyncio
+import uuid
 from datetime import datetime
 
 from fastapi import Depends
 from redis.asyncio import Redis
 
 from app.core.config import settings
-from app.core.redis import get_redis
+from app.core.metrics import metrics
+from app.core.redis import get_redis, near_cache
+from app.core.singleflight import SingleFlight
 from app.exception import ServiceException
 from app.models.response import TokenResponse
-from app.models.security import SecurityUser
+from app.models.security import SecurityUser, SessionVO
 from app.models.user import PrueUserVO, User
-from app.repository.user import UserRepository, get_user_repository
+from app.repository.base import LoadProfile
+from app.repository.user import UserRepository, get_primary_user_repository
 from app.utils.jwt import (
     JwtPayload,
-    create_two_token,
+    create_access_token,
+    create_refresh_token,
     decode_token,
+    is_token_blacklisted,
 )
 from app.utils.pwd import verify_password
 
+from .security_cache import WATERMARK_KEY, security_user_cache
+from .session import SessionStore
+from .stateless import build_stateless_claims
+
+# 登录后客户端并发发出的请求携带同一个令牌，合并它们的认证用户加载
+_authenticated_user_flight: SingleFlight[tuple[str, str, str], SecurityUser | None] = SingleFlight(
+    'auth.get_authenticated_user'
+)
+
 
 class AuthService:
     def __init__(self, user_repository: UserRepository, redis: Redis):
         self.user_repository = user_repository
         self.redis = redis
+        self.session_store = SessionStore(redis)
 
-    async def authenticate_user(self, username: str, password: str) -> TokenResponse | None:
+    async def authenticate_user(self, username: str, password: str, device: str | None = None) -> TokenResponse | None:
         user = await self.user_repository.get_one_by_field('username', username)
 
         if not user:
@@ -31,12 +48,9 @@ class AuthService:
 
         if not await verify_password(password, user.password):
             return None
-        payload: JwtPayload = {'subject': user.username}
-        access_token, refresh_token = await create_two_token(payload)
-        pipe = self.redis.pipeline()
-        pipe.set(f'token:access_token:{user.id}', access_token, settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60)
-        pipe.set(f'token:refresh_token:{user.id}', refresh_token, settings.REFRESH_TOKEN_EXPIRE_MINUTES * 60)
-        await pipe.execute()
+        session_id = uuid.uuid4().hex
+        access_token, refresh_token, refresh_jti = await self.create_tokens(user.id, user.username, session_id)
+        await self.session_store.create(user.id, session_id, access_token, refresh_jti, device)
 
         return TokenResponse.success(
             access_token=access_token,
@@ -44,17 +58,92 @@ class AuthService:
             token_type='bearer',
         )
 
-    async def get_authenticated_user(self, username: str) -> SecurityUser | None:
-        user: User | None = await self.user_repository.get_one_by_field(field_name='username', field_value=username)
-        if not user:
-            return None
-        exist = await self.redis.get(f'token:access_token:{user.id}')
-        if not exist:
-            return None
-        menus = [menu for role in user.roles for menu in role.menus]
-        perms = [menu.perms for menu in menus if menu.perms]
-        roles = [role.name for role in user.roles]
-        security_user = SecurityUser(user=PrueUserVO.model_validate(user), roles=roles, permissions=perms)
+    async def create_tokens(self, user_id: int, username: str, session_id: str) -> tuple[str, str, str]:
+        """
+        签发访问令牌和刷新令牌，开启无状态模式时访问令牌携带角色和权限位图
+
+        Returns:
+            访问令牌、刷新令牌、刷新令牌的jti
+        """
+        payload: JwtPayload = {'subject': username, 'uid': user_id, 'sid': session_id}
+        refresh_jti = uuid.uuid4().hex
+        refresh_token = await create_refresh_token({**payload, 'jti': refresh_jti})
+        if not settings.STATELESS_ACCESS_TOKEN:
+            return await create_access_token(payload), refresh_token, refresh_jti
+
+        # 水位和版本号在同一次读取中先于认证用户读取，加载期间发生的失效会使令牌中的水位落后而触发校验
+        raw_watermark, *values = await self.redis.mget(WATERMARK_KEY, *security_user_cache.generation_keys(username))
+        generation = security_user_cache.parse_generation(values)
+        security_user = await self.load_security_user(username)
+        if security_user is None:
+            return await create_access_token(payload), refresh_token, refresh_jti
+        claims = await build_stateless_claims(
+            self.redis, self.user_repository.db, security_user, int(raw_watermark or 0), generation
+        )
+        access_token = await create_access_token({**payload, **claims}, stateless=True)
+        return access_token, refresh_token, refresh_jti
+
+    async def get_authenticated_user(self, username: str, session_id: str, access_token: str) -> SecurityUser | None:
+        """
+        获取认证用户，并校验访问令牌所属的登录会话仍然有效
+        """
+        user, _ = await _authenticated_user_flight.do(
+            (username, session_id, access_token), lambda: self.load_security_user(username, (session_id, access_token))
+        )
+        return user
+
+    async def load_security_user(self, username: str, session: tuple[str, str] | None = None) -> SecurityUser | None:
+        """
+        通过两级缓存加载认证用户
+
+        Args:
+            username: 用户名
+            session: (会话ID, 访问令牌)，传入时校验会话存在且令牌为该会话当前的访问令牌
+
+        Returns:
+            认证用户，用户不存在或会话失效时返回None
+        """
+        cache = security_user_cache
+        generation_keys = cache.generation_keys(username)
+
+        # 本地缓存命中时并发校验会话和缓存版本，近端缓存未命中的读取由自动管道合并为一次往返
+        if entry := cache.get_local(username):
+            reads = [near_cache.mget(self.redis, *generation_keys)]
+            if session:
+                reads.append(near_cache.hget(self.redis, SessionStore.key(entry.security_user.user.id), session[0]))
+            values, *session_values = await asyncio.gather(*reads)
+            if cache.is_fresh(entry, cache.parse_generation(values)):
+                metrics.incr('security_user_cache.local_hit')
+                if session and not SessionStore.is_valid(session_values[0], session[1]):
+                    return None
+                return entry.security_user
+
+        # 版本号必须在加载数据前读取，避免并发失效时把旧数据写成新版本
+        raw, *values = await near_cache.mget(self.redis, cache.user_key(username), *generation_keys)
+        generation = cache.parse_generation(values)
+        entry = cache.parse_shared(raw)
+        if entry and cache.is_fresh(entry, generation):
+            metrics.incr('security_user_cache.redis_hit')
+            security_user = entry.security_user
+            cache.local.set(username, entry)
+        else:
+            metrics.incr('security_user_cache.miss')
+            user: User | None = await self.user_repository.get_one_by_field(
+                field_name='username', field_value=username, profile=LoadProfile.AUTH
+            )
+            if not user:
+                return None
+            # 与权限注册表一致，不计入已软删除的菜单
+            menus = [menu for role in user.roles for menu in role.menus if menu.deleted_at is None]
+            perms = [menu.perms for menu in menus if menu.perms]
+            roles = [role.name for role in user.roles]
+            security_user = SecurityUser(user=PrueUserVO.model_validate(user), roles=roles, permissions=perms)
+            await cache.set(self.redis, username, security_user, generation)
+
+        if session:
+            raw_session = await near_cache.hget(self.redis, SessionStore.key(security_user.user.id), session[0])
+            if not SessionStore.is_valid(raw_session, session[1]):
+                return None
         return security_user
 
     async def refresh_token(self, refresh_token: str) -> TokenResponse | None:
@@ -68,20 +157,43 @@ class AuthService:
         if exp is not None and exp < datetime.now().timestamp():
             raise refresh_token_error
 
-        if not (username := payload.get('subject')):
+        if await is_token_blacklisted(self.redis, refresh_token):
             raise refresh_token_error
-        user = await self.user_repository.get_one_by_field('username', username)
-        if user is None:
+
+        username, jti, session_id = payload.get('subject'), payload.get('jti'), payload.get('sid')
+        if not username or not jti or not session_id:
+            raise refresh_token_error
+        # 只需确认用户仍然存在，按唯一索引查主键即可
+        user_id = await self.user_repository.get_id_by_field('username', username)
+        if user_id is None:
+            raise refresh_token_error
+
+        access, refresh, refresh_jti = await self.create_tokens(user_id, username, session_id)
+        result = await self.session_store.rotate(user_id, username, session_id, jti, refresh_jti, access)
+        if result == -1:
+            # 已轮换过的刷新令牌被再次使用，可能已泄露，该会话的令牌族已吊销
+            metrics.incr('auth.refresh_token_reuse')
+            security_user_cache.local.pop(username)
+            raise ServiceException(401, '刷新令牌已失效，请重新登录')
+        if result != 1:
             raise refresh_token_error
-        access, refresh = await create_two_token(payload)
         return TokenResponse.success(
             access_token=access,
             refresh_token=refresh,
             token_type='bearer',
         )
 
+    async def get_sessions(self, user_id: int, current_session_id: str | None = None) -> list[SessionVO]:
+        return await self.session_store.list(user_id, current_session_id)
+
+    async def revoke_session(self, user_id: int, username: str, session_id: str):
+        await self.session_store.revoke(user_id, username, session_id)
+
+    async def revoke_all_sessions(self, user_id: int, username: str):
+        await self.session_store.revoke_all(user_id, username)
+
 
 async def get_auth_service(
-    user_repository: UserRepository = Depends(get_user_repository), redis: Redis = Depends(get_redis)
+    user_repository: UserRepository = Depends(get_primary_user_repository), redis: Redis = Depends(get_redis)
 ) -> AuthService:
     return AuthService(user_repository, redis)
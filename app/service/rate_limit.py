@@ -0,0 +1,119 @@
+import math
+import time
+
+from fastapi import HTTPException, status
+from loguru import logger
+from redis.asyncio import Redis
+from redis.commands.core import AsyncScript
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.redis import REDIS_UNAVAILABLE_ERRORS
+
+# 多个令牌桶的原子检查与扣减：任一桶没有令牌则全部不扣减，否则各扣一个令牌
+# KEYS: 令牌桶键
+# ARGV: 每个桶依次为 容量, 每秒补充的令牌数
+# 返回: 每个桶需要等待的毫秒数，全为0表示放行
+TOKEN_BUCKET_LUA = """
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local tokens = {}
+local waits = {}
+local rejected = false
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[i * 2 - 1])
+    local rate = tonumber(ARGV[i * 2])
+    local state = redis.call('HMGET', key, 'tokens', 'ts')
+    local available = tonumber(state[1]) or capacity
+    local ts = tonumber(state[2]) or now
+    available = math.min(capacity, available + math.max(0, now - ts) * rate)
+    waits[i] = 0
+    if available < 1 then
+        waits[i] = math.ceil((1 - available) / rate * 1000)
+        rejected = true
+    end
+    tokens[i] = available
+end
+if rejected then
+    return waits
+end
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[i * 2 - 1])
+    local rate = tonumber(ARGV[i * 2])
+    redis.call('HSET', key, 'tokens', tokens[i] - 1, 'ts', now)
+    redis.call('EXPIRE', key, math.ceil(capacity / rate))
+end
+return waits
+"""
+
+
+class LoginRateLimiter:
+    """
+    登录限流：按用户名和客户端IP各一个令牌桶
+
+    令牌桶保存在Redis中，多个worker共享；被拒绝的键在本地记录解封时间，
+    解封前的请求直接在本地拒绝，不再访问Redis。Redis不可用时只按本地记录拦截，其余请求放行，
+    避免Redis故障导致所有用户无法登录。
+    """
+
+    def __init__(self, user_capacity: int, user_per_minute: int, ip_capacity: int, ip_per_minute: int):
+        self.user_limit = (user_capacity, user_per_minute / 60)
+        self.ip_limit = (ip_capacity, ip_per_minute / 60)
+        self.blocked: LRUCache[str, float] = LRUCache(maxsize=10000)
+        self._script: AsyncScript | None = None
+
+    @staticmethod
+    def keys(username: str, ip: str | None) -> list[str]:
+        keys = [f'rate:login:user:{username}']
+        if ip:
+            keys.append(f'rate:login:ip:{ip}')
+        return keys
+
+    def _reject(self, retry_after: float):
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail='登录尝试过于频繁，请稍后再试',
+            headers={'Retry-After': str(max(1, math.ceil(retry_after)))},
+        )
+
+    async def check(self, redis: Redis, username: str, ip: str | None):
+        """
+        消耗一次登录尝试，超出限制时抛出429
+
+        Args:
+            redis: Redis客户端
+            username: 登录用户名
+            ip: 客户端IP
+        """
+        keys = self.keys(username, ip)
+        now = time.monotonic()
+        for key in keys:
+            if (until := self.blocked.get(key)) and until > now:
+                metrics.incr('login_rate_limit.local_reject')
+                self._reject(until - now)
+
+        if self._script is None:
+            self._script = redis.register_script(TOKEN_BUCKET_LUA)
+        limits = [self.user_limit, self.ip_limit][: len(keys)]
+        try:
+            waits = await self._script(keys=keys, args=[value for limit in limits for value in limit], client=redis)
+        except REDIS_UNAVAILABLE_ERRORS as e:
+            metrics.incr('login_rate_limit.fail_open')
+            logger.warning('登录限流不可用，放行本次登录尝试: {!r}', e)
+            return
+        if any(waits):
+            # 只在本地拦截耗尽的桶，避免同一IP下的其他用户名或其他IP下的同一用户名被误伤
+            for key, wait_ms in zip(keys, waits, strict=True):
+                if wait_ms:
+                    self.blocked.set(key, now + wait_ms / 1000, ttl=wait_ms / 1000)
+            metrics.incr('login_rate_limit.reject')
+            self._reject(max(waits) / 1000)
+
+
+login_rate_limiter = LoginRateLimiter(
+    settings.LOGIN_USER_BUCKET_CAPACITY,
+    settings.LOGIN_USER_REFILL_PER_MINUTE,
+    settings.LOGIN_IP_BUCKET_CAPACITY,
+    settings.LOGIN_IP_REFILL_PER_MINUTE,
+)
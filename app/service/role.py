@@ -1,13 +1,19 @@
+from functools import partial
 from typing import Annotated
 
 from fastapi import Depends
+from redis.asyncio import Redis
 
+from app.core.database import after_commit
 from app.core.deps import get_current_user
+from app.core.redis import get_redis
 from app.models.role import RoleCreateDTO, RoleUpdateDTO, RoleVO
 from app.models.security import SecurityUser
+from app.repository.base import LoadProfile
 from app.repository.role import RoleRepository, get_role_repository
 from app.service.menu import MenuService, get_menu_service
 
+from .security_cache import security_user_cache
 from .utils import set_create_field, set_update_field
 
 
@@ -17,13 +23,21 @@ class RoleService:
         role_repository: RoleRepository,
         menu_service: MenuService,
         current_user: SecurityUser,
+        redis: Redis,
     ):
         self.role_repository = role_repository
         self.current_user = current_user
         self.menu_service = menu_service
+        self.redis = redis
+
+    def _invalidate_security_users(self):
+        """
+        角色或角色权限变更会影响所有持有该角色的用户，事务提交后使全部认证缓存失效
+        """
+        after_commit(self.role_repository.db, partial(security_user_cache.invalidate_all, self.redis))
 
     async def get_role_by_id(self, role_id: int):
-        role = await self.role_repository.get_by_id(role_id)
+        role = await self.role_repository.get_by_id(role_id, LoadProfile.FULL)
         if not role:
             return None
         return RoleVO.model_validate(role)
@@ -40,16 +54,22 @@ class RoleService:
     async def update_role(self, role_dto: RoleUpdateDTO) -> bool:
         await set_update_field(role_dto, self.current_user)
         role = await self.role_repository.update(role_dto)
+        if role:
+            self._invalidate_security_users()
         return bool(role)
 
     async def delete_role(self, role_id: int) -> bool:
-        return await self.role_repository.delete(role_id)
+        success = await self.role_repository.delete(role_id)
+        if success:
+            self._invalidate_security_users()
+        return success
 
     async def update_role_menus(self, role_id: int, menu_ids: list[int]) -> bool:
-        role = await self.role_repository.get_by_id(role_id)
+        role = await self.role_repository.get_by_id(role_id, LoadProfile.FULL)
         if not role:
             return False
         role.menus = await self.menu_service.get_menus_by_ids(menu_ids)
+        self._invalidate_security_users()
         return True
 
 
@@ -57,5 +77,6 @@ async def get_role_service(
     role_repository: Annotated[RoleRepository, Depends(get_role_repository)],
     menu_service: Annotated[MenuService, Depends(get_menu_service)],
     current_user: Annotated[SecurityUser, Depends(get_current_user)],
+    redis: Annotated[Redis, Depends(get_redis)],
 ) -> RoleService:
-    return RoleService(role_repository, menu_service, current_user)
+    return RoleService(role_repository, menu_service, current_user, redis)
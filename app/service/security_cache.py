@@ -0,0 +1,108 @@
+import json
+from dataclasses import dataclass
+
+from redis.asyncio import Redis
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.models.security import SecurityUser
+
+GENERATION_KEY = 'security_user:generation'
+# 吊销水位，任意失效都会递增，无状态访问令牌据此判断是否需要复核
+WATERMARK_KEY = 'token:watermark'
+
+
+@dataclass(slots=True)
+class SecurityUserEntry:
+    security_user: SecurityUser
+    generation: tuple[int, int]
+
+
+class SecurityUserCache:
+    """
+    认证用户两级缓存：进程内LRU + Redis共享副本
+
+    缓存项记录写入时的全局版本号和用户版本号，读取时与Redis中的当前版本比较，
+    版本不一致即视为失效。角色/菜单变更递增全局版本，单个用户变更递增该用户的版本，
+    因此多个worker之间无需广播即可感知失效。
+    """
+
+    def __init__(self, maxsize: int, ttl: int):
+        self.ttl = ttl
+        self.local: LRUCache[str, SecurityUserEntry] = LRUCache(maxsize, ttl)
+        metrics.gauge('security_user_cache.size', lambda: len(self.local))
+
+    @staticmethod
+    def user_key(username: str) -> str:
+        return f'security_user:{username}'
+
+    @staticmethod
+    def generation_keys(username: str) -> list[str]:
+        return [GENERATION_KEY, f'security_user:generation:{username}']
+
+    @staticmethod
+    def parse_generation(values) -> tuple[int, int]:
+        global_gen, user_gen = values
+        return int(global_gen or 0), int(user_gen or 0)
+
+    def get_local(self, username: str) -> SecurityUserEntry | None:
+        return self.local.get(username)
+
+    def parse_shared(self, raw: str | None) -> SecurityUserEntry | None:
+        """
+        解析Redis中的共享副本
+        """
+        if not raw:
+            return None
+        data = json.loads(raw)
+        return SecurityUserEntry(
+            security_user=SecurityUser.model_validate(data['user']),
+            generation=tuple(data['generation']),  # type: ignore
+        )
+
+    def is_fresh(self, entry: SecurityUserEntry, generation: tuple[int, int]) -> bool:
+        return entry.generation == generation
+
+    async def set(self, redis: Redis, username: str, security_user: SecurityUser, generation: tuple[int, int]):
+        """
+        写入两级缓存
+
+        Args:
+            redis: Redis客户端
+            username: 用户名
+            security_user: 认证用户
+            generation: 加载数据前读取到的版本号
+        """
+        entry = SecurityUserEntry(security_user=security_user, generation=generation)
+        self.local.set(username, entry)
+        raw = json.dumps({'generation': list(generation), 'user': security_user.model_dump(mode='json')})
+        await redis.set(self.user_key(username), raw, ex=self.ttl)
+
+    async def invalidate_user(self, redis: Redis, username: str):
+        """
+        使单个用户的缓存失效
+        """
+        self.local.pop(username)
+        _, user_generation_key = self.generation_keys(username)
+        pipe = redis.pipeline()
+        # 版本键不设过期：过期后版本回到0，会与更早的缓存项或无状态令牌中记录的版本重新相等
+        pipe.incr(user_generation_key)
+        pipe.delete(self.user_key(username))
+        pipe.incr(WATERMARK_KEY)
+        await pipe.execute()
+        metrics.incr('security_user_cache.invalidate_user')
+
+    async def invalidate_all(self, redis: Redis):
+        """
+        使所有用户的缓存失效，用于角色、菜单权限变更
+        """
+        self.local.clear()
+        pipe = redis.pipeline()
+        pipe.incr(GENERATION_KEY)
+        pipe.incr(WATERMARK_KEY)
+        await pipe.execute()
+        metrics.incr('security_user_cache.invalidate_all')
+
+
+security_user_cache = SecurityUserCache(settings.SECURITY_USER_CACHE_SIZE, settings.SECURITY_USER_CACHE_TTL)
@@ -0,0 +1,179 @@
+import json
+import time
+
+from redis.asyncio import Redis
+
+from app.core.config import settings
+from app.models.security import SessionVO
+from app.utils.jwt import token_digest
+
+from .security_cache import WATERMARK_KEY, security_user_cache
+
+# 新增会话：写入会话、清理过期会话、超出上限时淘汰最早的会话
+# KEYS: 会话哈希键
+# ARGV: 会话ID, 会话JSON, 当前时间戳, 每个用户最多会话数, 哈希键TTL
+CREATE_SESSION_LUA = """
+redis.call('HSET', KEYS[1], ARGV[1], ARGV[2])
+local now = tonumber(ARGV[3])
+local entries = redis.call('HGETALL', KEYS[1])
+local alive = {}
+for i = 1, #entries, 2 do
+    local session = cjson.decode(entries[i + 1])
+    if session.exp <= now then
+        redis.call('HDEL', KEYS[1], entries[i])
+    else
+        table.insert(alive, {entries[i], session.created})
+    end
+end
+local overflow = #alive - tonumber(ARGV[4])
+if overflow > 0 then
+    table.sort(alive, function(a, b) return a[2] < b[2] end)
+    for i = 1, overflow do
+        redis.call('HDEL', KEYS[1], alive[i][1])
+    end
+end
+redis.call('EXPIRE', KEYS[1], ARGV[5])
+return #alive
+"""
+
+# 刷新令牌轮换：比较会话中的jti、写入新令牌、检测重用，在一次往返内原子完成
+# KEYS: 会话哈希键, 用户缓存版本键, 吊销水位键
+# ARGV: 会话ID, 提交的jti, 新刷新令牌jti, 新访问令牌摘要, 新过期时间戳, 哈希键TTL
+# 返回: 1 成功, 0 会话不存在, -1 检测到重用（已吊销该会话的令牌族）
+ROTATE_SESSION_LUA = """
+local raw = redis.call('HGET', KEYS[1], ARGV[1])
+if not raw then
+    return 0
+end
+local session = cjson.decode(raw)
+if session.r ~= ARGV[2] then
+    redis.call('HDEL', KEYS[1], ARGV[1])
+    redis.call('INCR', KEYS[2])
+    redis.call('INCR', KEYS[3])
+    return -1
+end
+session.r = ARGV[3]
+session.a = ARGV[4]
+session.exp = tonumber(ARGV[5])
+redis.call('HSET', KEYS[1], ARGV[1], cjson.encode(session))
+redis.call('EXPIRE', KEYS[1], ARGV[6])
+return 1
+"""
+
+
+class SessionStore:
+    """
+    按用户存储的多会话令牌库
+
+    每个用户一个哈希 session:{user_id}，字段为会话ID，值为
+    {a: 访问令牌摘要, r: 刷新令牌jti, device, created, exp}。
+    只保存摘要而不是完整令牌，会话随刷新令牌过期，超过上限时淘汰最早的会话。
+    """
+
+    def __init__(self, redis: Redis):
+        self.redis = redis
+        self.create_script = redis.register_script(CREATE_SESSION_LUA)
+        self.rotate_script = redis.register_script(ROTATE_SESSION_LUA)
+
+    @staticmethod
+    def key(user_id: int) -> str:
+        return f'session:{user_id}'
+
+    @staticmethod
+    def is_valid(raw: str | None, access_token: str) -> bool:
+        """
+        检查会话存在、未过期且访问令牌为该会话当前签发的令牌
+        """
+        if not raw:
+            return False
+        session = json.loads(raw)
+        return session['exp'] > time.time() and session['a'] == token_digest(access_token).hex()
+
+    async def create(
+        self, user_id: int, session_id: str, access_token: str, refresh_jti: str, device: str | None = None
+    ):
+        now = int(time.time())
+        ttl = settings.REFRESH_TOKEN_EXPIRE_MINUTES * 60
+        session = {
+            'a': token_digest(access_token).hex(),
+            'r': refresh_jti,
+            'device': device,
+            'created': now,
+            'exp': now + ttl,
+        }
+        await self.create_script(
+            keys=[self.key(user_id)],
+            args=[session_id, json.dumps(session), now, settings.SESSION_MAX_PER_USER, ttl],
+        )
+
+    async def rotate(
+        self, user_id: int, username: str, session_id: str, presented_jti: str, refresh_jti: str, access_token: str
+    ) -> int:
+        """
+        轮换会话的令牌
+
+        Returns:
+            1 成功, 0 会话不存在, -1 检测到刷新令牌重用
+        """
+        ttl = settings.REFRESH_TOKEN_EXPIRE_MINUTES * 60
+        _, user_generation_key = security_user_cache.generation_keys(username)
+        return await self.rotate_script(
+            keys=[self.key(user_id), user_generation_key, WATERMARK_KEY],
+            args=[
+                session_id,
+                presented_jti,
+                refresh_jti,
+                token_digest(access_token).hex(),
+                int(time.time()) + ttl,
+                ttl,
+            ],
+        )
+
+    async def list(self, user_id: int, current_session_id: str | None = None) -> list[SessionVO]:
+        now = time.time()
+        entries = await self.redis.hgetall(self.key(user_id))
+        sessions = []
+        for session_id, raw in entries.items():
+            session = json.loads(raw)
+            if session['exp'] <= now:
+                continue
+            sessions.append(
+                SessionVO(
+                    session_id=session_id,
+                    device=session.get('device'),
+                    created_at=session['created'],
+                    expires_at=session['exp'],
+                    current=session_id == current_session_id,
+                )
+            )
+        return sorted(sessions, key=lambda session: session.created_at, reverse=True)
+
+    def _pipeline_invalidating_user(self, username: str):
+        """
+        返回已加入递增用户缓存版本和吊销水位命令的管道
+
+        无状态访问令牌不检查会话，版本变化后该用户的无状态令牌回退到有状态校验，
+        被吊销会话的令牌随之失效，其它会话的令牌仍然有效。
+        """
+        security_user_cache.local.pop(username)
+        _, user_generation_key = security_user_cache.generation_keys(username)
+        pipe = self.redis.pipeline()
+        pipe.incr(user_generation_key)
+        pipe.incr(WATERMARK_KEY)
+        return pipe
+
+    async def revoke(self, user_id: int, username: str, session_id: str):
+        """
+        吊销单个会话，同时让该用户的认证缓存和无状态令牌失效
+        """
+        pipe = self._pipeline_invalidating_user(username)
+        pipe.hdel(self.key(user_id), session_id)
+        await pipe.execute()
+
+    async def revoke_all(self, user_id: int, username: str):
+        """
+        吊销用户的全部会话，同时让该用户的认证缓存和无状态令牌失效
+        """
+        pipe = self._pipeline_invalidating_user(username)
+        pipe.delete(self.key(user_id))
+        await pipe.execute()
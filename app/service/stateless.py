@@ -0,0 +1,178 @@
+import base64
+import hashlib
+import json
+import time
+
+from loguru import logger
+from redis.asyncio import Redis
+from sqlalchemy import distinct, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.redis import near_cache
+from app.models.menu import Menu
+from app.models.security import SecurityUser
+from app.models.user import PrueUserVO
+from app.utils.jwt import JwtPayload
+from app.utils.permission import PermissionMatcher
+
+from .security_cache import WATERMARK_KEY, security_user_cache
+
+REGISTRY_KEY = 'permission:registry'
+REGISTRY_TTL = 3600
+
+
+class PermissionRegistry:
+    """
+    权限注册表：menu.perms 去重排序后的列表，下标即权限位图中的位序号
+
+    版本号由列表内容哈希得到，所有worker对同一份权限集合计算出相同版本，
+    令牌中携带版本号，版本不一致时无法解码位图。
+    """
+
+    def __init__(self):
+        self.version: str | None = None
+        self.perms: list[str] = []
+        self.index: dict[str, int] = {}
+
+    def _apply(self, perms: list[str]):
+        self.perms = perms
+        self.index = {perm: i for i, perm in enumerate(perms)}
+        self.version = hashlib.sha1(json.dumps(perms).encode()).hexdigest()[:12]
+
+    async def load(self, redis: Redis) -> bool:
+        """
+        从Redis加载共享的注册表
+
+        Returns:
+            是否加载成功
+        """
+        raw = await near_cache.get(redis, REGISTRY_KEY)
+        if not raw:
+            return False
+        self._apply(json.loads(raw))
+        return True
+
+    async def rebuild(self, redis: Redis, db: AsyncSession):
+        """
+        从数据库重建注册表并写入Redis
+        """
+        result = await db.scalars(
+            select(distinct(Menu.perms)).where(Menu.perms.is_not(None), Menu.deleted_at.is_(None)).order_by(Menu.perms)
+        )
+        self._apply([perm for perm in result.all() if perm])
+        await redis.set(REGISTRY_KEY, json.dumps(self.perms), ex=REGISTRY_TTL)
+        metrics.incr('permission_registry.rebuild')
+
+    def encode(self, perms: list[str]) -> str:
+        bitmap = 0
+        for perm in perms:
+            # 重建后仍不在注册表中的权限（如对应菜单刚被删除）无法编码，跳过
+            if (bit := self.index.get(perm)) is None:
+                metrics.incr('permission_registry.unknown_perm')
+                logger.warning('权限 {} 不在权限注册表中，未写入令牌', perm)
+                continue
+            bitmap |= 1 << bit
+        raw = bitmap.to_bytes((bitmap.bit_length() + 7) // 8, 'little')
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    def decode(self, encoded: str) -> list[str]:
+        bitmap = int.from_bytes(base64.urlsafe_b64decode(encoded + '=' * (-len(encoded) % 4)), 'little')
+        return [perm for i, perm in enumerate(self.perms) if bitmap >> i & 1]
+
+
+class RevocationWatermark:
+    """
+    吊销水位：任意认证缓存失效都会递增 Redis 中的水位，本地最多每 poll_seconds 秒拉取一次。
+    令牌携带签发时的水位，与当前水位一致时无需访问Redis即可信任令牌中的权限。
+    因此吊销最多延迟 poll_seconds 秒生效。
+    """
+
+    def __init__(self, poll_seconds: float):
+        self.poll_seconds = poll_seconds
+        self.value = 0
+        self.fetched_at = 0.0
+
+    async def get(self, redis: Redis) -> int:
+        now = time.monotonic()
+        if now - self.fetched_at >= self.poll_seconds:
+            self.value = int(await near_cache.get(redis, WATERMARK_KEY) or 0)
+            self.fetched_at = now
+        return self.value
+
+
+permission_registry = PermissionRegistry()
+revocation_watermark = RevocationWatermark(settings.STATELESS_WATERMARK_POLL_SECONDS)
+# 相同角色组合的用户位图相同，缓存解码结果和编译后的匹配器
+_decoded_perms: LRUCache[tuple[str, str], tuple[list[str], PermissionMatcher]] = LRUCache(maxsize=1024)
+
+
+async def build_stateless_claims(
+    redis: Redis, db: AsyncSession, security_user: SecurityUser, watermark: int, generation: tuple[int, int]
+) -> JwtPayload:
+    """
+    生成无状态访问令牌需要携带的声明
+
+    Args:
+        redis: Redis客户端
+        db: 数据库会话，注册表缺失或过旧时用于重建
+        security_user: 认证用户
+        watermark: 加载认证用户前读取到的吊销水位
+        generation: 与水位一同读取到的缓存版本号
+
+    Returns:
+        令牌声明
+    """
+    perms = security_user.permissions or []
+    if permission_registry.version is None:
+        await permission_registry.load(redis)
+    if permission_registry.version is None or any(perm not in permission_registry.index for perm in perms):
+        await permission_registry.rebuild(redis, db)
+    return {
+        'uid': security_user.user.id,
+        'email': security_user.user.email,
+        'roles': security_user.roles or [],
+        'pv': permission_registry.version,  # type: ignore
+        'perm': permission_registry.encode(perms),
+        'wm': watermark,
+        'gen': list(generation),
+    }
+
+
+async def resolve_stateless_user(redis: Redis, payload: JwtPayload) -> SecurityUser | None:
+    """
+    根据无状态访问令牌中的声明还原认证用户
+
+    Returns:
+        认证用户；注册表版本不一致或用户权限已变更时返回None，由调用方回退到有状态校验
+    """
+    if payload.get('pv') != permission_registry.version:
+        await permission_registry.load(redis)
+        if payload.get('pv') != permission_registry.version:
+            metrics.incr('stateless_token.fallback')
+            return None
+
+    username = payload['subject']
+    if payload.get('wm') != await revocation_watermark.get(redis):
+        # 水位变化说明有缓存失效发生，只需确认该用户的版本未变
+        values = await near_cache.mget(redis, *security_user_cache.generation_keys(username))
+        if list(security_user_cache.parse_generation(values)) != payload.get('gen'):
+            metrics.incr('stateless_token.fallback')
+            return None
+
+    metrics.incr('stateless_token.hit')
+    key = (permission_registry.version, payload['perm'])
+    if (decoded := _decoded_perms.get(key)) is None:
+        perms = permission_registry.decode(payload['perm'])
+        decoded = (perms, PermissionMatcher(perms))
+        _decoded_perms.set(key, decoded)  # type: ignore
+    perms, matcher = decoded
+    security_user = SecurityUser(
+        user=PrueUserVO(id=payload['uid'], username=username, email=payload.get('email')),
+        roles=payload.get('roles'),
+        permissions=perms,
+    )
+    security_user._matcher = matcher
+    return security_user
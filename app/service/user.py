@@ -1,18 +1,29 @@
-from typing import Annotated
+from collections.abc import AsyncIterator
+from functools import partial
+from typing import Annotated, Literal
 
 from fastapi import Depends
+from redis.asyncio import Redis
 
+from app.core.database import after_commit, read_session
 from app.core.deps import get_current_user
+from app.core.redis import get_redis
 from app.exception import ServiceException
-from app.models.response import Pagination, ResponseCode
+from app.models.response import CursorPagination, Pagination, ResponseCode
 from app.models.security import SecurityUser
 from app.models.user import PassWordChangeDTO, UserCreateDTO, UserUpdateDTO, UserVO
+from app.repository.base import LoadProfile
 from app.repository.user import UserRepository, get_user_repository
-from app.utils.pwd import get_password_hash, verify_password
+from app.utils.export import iter_csv, iter_ndjson
+from app.utils.pwd import get_password_hash, get_password_hashes, verify_password
 
 from .role import RoleService, get_role_service
+from .security_cache import security_user_cache
 from .utils import set_create_field, set_update_field
 
+# 导出字段，不包含密码
+EXPORT_COLUMNS = ['id', 'username', 'email', 'nickname', 'phone', 'gender', 'birthday', 'avatar', 'created_at']
+
 
 class UserService:
     def __init__(
@@ -20,20 +31,43 @@ class UserService:
         user_repository: UserRepository,
         role_service: RoleService,
         current_user: SecurityUser,
+        redis: Redis,
     ):
         self.user_repository = user_repository
         self.role_service = role_service
         self.current_user = current_user
+        self.redis = redis
+
+    def _invalidate_security_user(self, username: str):
+        """
+        事务提交后使该用户的认证缓存失效
+        """
+        after_commit(self.user_repository.db, partial(security_user_cache.invalidate_user, self.redis, username))
 
     async def get_users(self, page_index, page_size) -> Pagination[UserVO]:
-        result = await self.user_repository.paginate(page_index, page_size)
+        result = await self.user_repository.paginate(page_index, page_size, LoadProfile.ROLES)
         users = result.data
         user_vos = [UserVO.model_validate(user) for user in users]
         result.data = user_vos
         return result
 
+    async def get_users_by_cursor(self, cursor: str | None, page_size: int) -> CursorPagination[UserVO]:
+        result = await self.user_repository.paginate_by_cursor(cursor, page_size, profile=LoadProfile.ROLES)
+        result.data = [UserVO.model_validate(user) for user in result.data]
+        return result
+
+    async def export_users(self, fmt: Literal['ndjson', 'csv']) -> AsyncIterator[bytes]:
+        """
+        流式导出用户，响应流期间请求的数据库会话已关闭，因此使用独立的只读会话
+        """
+        encoder = iter_csv if fmt == 'csv' else iter_ndjson
+        async with read_session() as db:
+            rows = UserRepository(db).stream_rows(EXPORT_COLUMNS)
+            async for chunk in encoder(EXPORT_COLUMNS, rows):
+                yield chunk
+
     async def get_user_by_id(self, user_id: int) -> UserVO | None:
-        user = await self.user_repository.get_by_id(user_id)
+        user = await self.user_repository.get_by_id(user_id, LoadProfile.ROLES)
         if not user:
             return None
         return UserVO.model_validate(user)
@@ -44,15 +78,30 @@ class UserService:
         new_user = await self.user_repository.create(user_dto)
         return UserVO.model_validate(new_user)
 
+    async def bulk_add_users(self, user_dtos: list[UserCreateDTO]) -> int:
+        hashed_passwords = await get_password_hashes([user_dto.password for user_dto in user_dtos])
+        for user_dto, hashed_password in zip(user_dtos, hashed_passwords, strict=True):
+            user_dto.password = hashed_password
+            await set_create_field(user_dto, self.current_user)
+        # 用户名已存在的行直接跳过，不覆盖已有用户
+        return await self.user_repository.bulk_upsert(user_dtos, index_elements=['username'])
+
     async def update_user(self, user_dto: UserUpdateDTO) -> bool:
         await set_update_field(user_dto, self.current_user)
         user = await self.user_repository.update(user_dto)
+        if user:
+            self._invalidate_security_user(user.username)
         return bool(user)
 
     async def delete_user(self, user_id: int) -> bool:
+        user = await self.user_repository.get_by_id(user_id)
+        if user is None:
+            return False
+        self._invalidate_security_user(user.username)
         return await self.user_repository.delete(user_id)
 
     async def batch_delete_user(self, user_ids: list[int]) -> bool:
+        after_commit(self.user_repository.db, partial(security_user_cache.invalidate_all, self.redis))
         return await self.user_repository.batch_delete(user_ids)
 
     async def change_password(self, password_change_dto: PassWordChangeDTO) -> bool:
@@ -66,6 +115,7 @@ class UserService:
             raise ServiceException(code=ResponseCode.ERROR, message='旧密码错误')
         user.password = await get_password_hash(new_pwd)
         await self.user_repository.db.flush()
+        self._invalidate_security_user(user.username)
         # TODO: 密码修改后，需要重新登录
         return True
 
@@ -75,20 +125,22 @@ class UserService:
             raise ServiceException(code=ResponseCode.ERROR, message='用户不存在')
         user.password = await get_password_hash(pwd)
         await self.user_repository.db.flush()
+        self._invalidate_security_user(user.username)
         # TODO: 密码重置后，需要重新登录
         return True
 
     async def update_roles(self, user_id: int, role_ids: list[int]) -> bool:
-        user = await self.user_repository.get_by_id(user_id)
+        user = await self.user_repository.get_by_id(user_id, LoadProfile.ROLES)
         if user is None:
             raise ServiceException(code=ResponseCode.ERROR, message='用户不存在')
         user.roles = await self.role_service.get_roles_by_ids(role_ids)
         await set_update_field(user, self.current_user)
         await self.user_repository.db.flush()
+        self._invalidate_security_user(user.username)
         return True
 
     async def get_perms(self, user_id: int) -> list[str]:
-        user = await self.user_repository.get_by_id(user_id)
+        user = await self.user_repository.get_by_id(user_id, LoadProfile.AUTH)
         if user is None:
             raise ServiceException(code=ResponseCode.ERROR, message='用户不存在')
         menus = [menu for role in user.roles for menu in role.menus]
@@ -100,5 +152,6 @@ async def get_user_service(
     user_repository: Annotated[UserRepository, Depends(get_user_repository)],
     role_service: Annotated[RoleService, Depends(get_role_service)],
     current_user: Annotated[SecurityUser, Depends(get_current_user)],
+    redis: Annotated[Redis, Depends(get_redis)],
 ) -> UserService:
-    return UserService(user_repository, role_service, current_user)
+    return UserService(user_repository, role_service, current_user, redis)
@@ -0,0 +1,64 @@
+import csv
+import io
+import json
+from collections.abc import AsyncIterator, Sequence
+from datetime import date
+from typing import Any
+
+# 每累计多少行输出一次，减少小块写入的开销
+FLUSH_ROWS = 500
+
+
+def _json_default(value: Any):
+    if isinstance(value, date):
+        return value.isoformat()
+    return str(value)
+
+
+async def iter_ndjson(columns: Sequence[str], rows: AsyncIterator[Sequence[Any]]) -> AsyncIterator[bytes]:
+    """
+    将行数据编码为NDJSON字节流，不构造pydantic模型
+
+    Args:
+        columns: 列名
+        rows: 行数据异步迭代器
+
+    Returns:
+        字节块异步迭代器
+    """
+    lines = []
+    async for row in rows:
+        lines.append(json.dumps(dict(zip(columns, row, strict=True)), ensure_ascii=False, default=_json_default))
+        if len(lines) >= FLUSH_ROWS:
+            yield ('\n'.join(lines) + '\n').encode()
+            lines.clear()
+    if lines:
+        yield ('\n'.join(lines) + '\n').encode()
+
+
+async def iter_csv(columns: Sequence[str], rows: AsyncIterator[Sequence[Any]]) -> AsyncIterator[bytes]:
+    """
+    将行数据编码为CSV字节流（带表头和UTF-8 BOM，方便Excel打开）
+
+    Args:
+        columns: 列名
+        rows: 行数据异步迭代器
+
+    Returns:
+        字节块异步迭代器
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write('\ufeff')
+    writer.writerow(columns)
+    count = 0
+    async for row in rows:
+        writer.writerow(row)
+        count += 1
+        if count >= FLUSH_ROWS:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+            count = 0
+    if buffer.tell():
+        yield buffer.getvalue().encode()
@@ -1,10 +1,18 @@
+import hashlib
+import time
+import uuid
 from datetime import datetime, timedelta
 from typing import Any, TypedDict
 
-import jwt
 from jwt import PyJWTError
 
+from app.core.cache import LRUCache
 from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.redis import REDIS_UNAVAILABLE_ERRORS
+
+from .jwt_keys import KeyRing
+from .revocation import BLACKLIST_PREFIX, REVOKED_CHANNEL, revocation_filter
 
 # JWT配置
 SECRET_KEY = settings.SECRET_KEY if hasattr(settings, 'SECRET_KEY') else 'your-secret-key'
@@ -12,20 +20,37 @@ ALGORITHM = settings.ALGORITHM
 ACCESS_TOKEN_EXPIRE_MINUTES = settings.ACCESS_TOKEN_EXPIRE_MINUTES
 REFRESH_TOKEN_EXPIRE_MINUTES = settings.REFRESH_TOKEN_EXPIRE_MINUTES
 
+key_ring = KeyRing(ALGORITHM, SECRET_KEY, settings.JWT_KEY_DIR, settings.JWT_ACTIVE_KID)
+
+# 已验签令牌的载荷缓存，键为令牌摘要，条目在令牌自身的exp时过期
+_decode_cache: LRUCache[bytes, dict] = LRUCache(maxsize=settings.JWT_DECODE_CACHE_SIZE)
+metrics.gauge('jwt_decode_cache.size', lambda: len(_decode_cache))
+
 
 class JwtPayload(TypedDict, total=False):
     subject: str
     exp: Any
     type: str
-
-
-async def create_access_token(data: JwtPayload, expires_delta: timedelta | None = None) -> str:
+    jti: str  # 令牌唯一ID，用于吊销，不传时自动生成
+    sid: str  # 登录会话ID
+    # 以下为无状态访问令牌的声明
+    uid: int
+    email: str | None
+    roles: list[str]
+    pv: str  # 权限注册表版本
+    perm: str  # 权限位图
+    wm: int  # 签发时的吊销水位
+    gen: list[int]  # 签发时的认证缓存版本
+
+
+async def create_access_token(data: JwtPayload, expires_delta: timedelta | None = None, stateless: bool = False) -> str:
     """
     创建访问令牌
 
     Args:
         data: 要编码的数据
         expires_delta: 过期时间增量
+        stateless: 是否为携带角色和权限位图的无状态令牌，默认有效期更短
 
     Returns:
         编码后的JWT访问令牌
@@ -34,10 +59,12 @@ async def create_access_token(data: JwtPayload, expires_delta: timedelta | None
 
     if expires_delta:
         expire = datetime.now() + expires_delta
+    elif stateless:
+        expire = datetime.now() + timedelta(minutes=settings.STATELESS_ACCESS_TOKEN_EXPIRE_MINUTES)
     else:
         expire = datetime.now() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({'exp': expire, 'type': 'access'})
-    encoded_jwt: str = jwt.encode(dict(to_encode), SECRET_KEY, algorithm=ALGORITHM)
+    to_encode.update({'exp': expire, 'type': 'access', 'jti': to_encode.get('jti') or uuid.uuid4().hex})
+    encoded_jwt: str = key_ring.sign(dict(to_encode))
     return encoded_jwt
 
 
@@ -59,8 +86,8 @@ async def create_refresh_token(data: JwtPayload, expires_delta: timedelta | None
     else:
         expire = datetime.now() + timedelta(minutes=REFRESH_TOKEN_EXPIRE_MINUTES)
 
-    to_encode.update({'exp': expire, 'type': 'refresh'})
-    encoded_jwt: str = jwt.encode(dict(to_encode), SECRET_KEY, algorithm=ALGORITHM)
+    to_encode.update({'exp': expire, 'type': 'refresh', 'jti': to_encode.get('jti') or uuid.uuid4().hex})
+    encoded_jwt: str = key_ring.sign(dict(to_encode))
     return encoded_jwt
 
 
@@ -88,38 +115,66 @@ async def decode_token(token: str) -> JwtPayload | None:
     Returns:
         解码后的数据，如果解码失败返回None
     """
+    digest = token_digest(token)
+    if (cached := _decode_cache.get(digest)) is not None:
+        metrics.incr('jwt_decode_cache.hit')
+        return cached.copy()  # type: ignore
+
+    metrics.incr('jwt_decode_cache.miss')
     try:
-        payload: JwtPayload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload
+        payload: JwtPayload = key_ring.verify(token)  # type: ignore
     except PyJWTError:
         return None
+    if (exp := payload.get('exp')) and (ttl := exp - time.time()) > 0:
+        _decode_cache.set(digest, dict(payload), ttl=ttl)
+    return payload
+
+
+def token_digest(token: str) -> bytes:
+    return hashlib.blake2b(token.encode(), digest_size=16).digest()
 
 
-async def add_token_to_blacklist(redis, token: str, expires_delta: timedelta) -> bool:
+def evict_decoded_token(token: str):
     """
-    将令牌添加到黑名单中
+    从解码缓存中移除令牌，令牌被吊销时调用
+    """
+    _decode_cache.pop(token_digest(token))
+
+
+def _revocation_id(payload: JwtPayload, token: str) -> str:
+    # 历史令牌没有jti时使用整个令牌的摘要，不能用前缀（前缀是所有令牌相同的JWT头）
+    return payload.get('jti') or token_digest(token).hex()
+
+
+async def add_token_to_blacklist(redis, token: str, expires_delta: timedelta | None = None) -> bool:
+    """
+    将令牌添加到黑名单中，并通知其它worker更新本地过滤器
 
     Args:
         redis: Redis客户端
         token: 要加入黑名单的令牌
-        expires_delta: 过期时间
+        expires_delta: 过期时间，不传时使用令牌剩余有效期
 
     Returns:
         添加成功返回True，否则返回False
     """
     try:
-        # 使用JWT的jti( JWT ID)作为键，但如果没有jti，则使用令牌本身
         payload = await decode_token(token)
         if payload is None:
             return False
 
-        jti = payload.get('jti')
-        if jti is None:
-            # 如果没有jti，使用令牌的前32个字符作为标识符
-            jti = token[:32] if len(token) > 32 else token
+        jti = _revocation_id(payload, token)
+        ttl = int(expires_delta.total_seconds()) if expires_delta else int(payload.get('exp', 0) - time.time())
+        if ttl <= 0:
+            return True  # 令牌已过期，无需吊销
 
         # 将令牌添加到Redis黑名单中
-        await redis.setex(f'blacklist:{jti}', int(expires_delta.total_seconds()), 'true')
+        pipe = redis.pipeline()
+        pipe.setex(f'{BLACKLIST_PREFIX}{jti}', ttl, 'true')
+        pipe.publish(REVOKED_CHANNEL, jti)
+        await pipe.execute()
+        revocation_filter.add(jti)
+        evict_decoded_token(token)
         return True
     except Exception:
         return False
@@ -127,7 +182,7 @@ async def add_token_to_blacklist(redis, token: str, expires_delta: timedelta) ->
 
 async def is_token_blacklisted(redis, token: str) -> bool:
     """
-    检查令牌是否在黑名单中
+    检查令牌是否在黑名单中，本地过滤器未命中时无需访问Redis
 
     Args:
         redis: Redis客户端
@@ -141,12 +196,16 @@ async def is_token_blacklisted(redis, token: str) -> bool:
         if payload is None:
             return True  # 无法解码的令牌视为已列入黑名单
 
-        jti = payload.get('jti')
-        if jti is None:
-            jti = token[:32] if len(token) > 32 else token
+        jti = _revocation_id(payload, token)
+        if not revocation_filter.might_be_revoked(jti):
+            metrics.incr('revocation_filter.negative')
+            return False
 
         # 检查令牌是否在Redis黑名单中
-        result = await redis.get(f'blacklist:{jti}')
+        metrics.incr('revocation_filter.redis_check')
+        result = await redis.get(f'{BLACKLIST_PREFIX}{jti}')
         return result is not None
+    except REDIS_UNAVAILABLE_ERRORS:
+        raise  # Redis不可用时由调用方按降级策略处理
     except Exception:
         return True  # 出现异常时保守地认为令牌已列入黑名单
@@ -0,0 +1,76 @@
+import hashlib
+import json
+from pathlib import Path
+from typing import Any
+
+import jwt
+from jwt.algorithms import get_default_algorithms
+
+# 使用 kid 和 JWKS 的非对称算法
+ASYMMETRIC_ALGORITHMS = {'ES256', 'EdDSA'}
+
+
+class KeyRing:
+    """
+    JWT密钥环，启动时一次性解析密钥，签名和验签直接使用密钥对象
+
+    非对称模式下从 key_dir 读取密钥，文件名（去掉扩展名）即 kid：
+    - <kid>.pem       私钥，可用于签名和验签
+    - <kid>.pub.pem   公钥，仅用于验签（轮换后保留旧密钥，直到旧令牌全部过期）
+    active_kid 指定当前签名使用的私钥，其余密钥只参与验签并发布在 JWKS 中。
+    """
+
+    def __init__(self, algorithm: str, secret: str, key_dir: str, active_kid: str | None):
+        self.algorithm = algorithm
+        self.asymmetric = algorithm in ASYMMETRIC_ALGORITHMS
+        self.signing_kid: str | None = None
+        self.signing_key: Any = secret
+        self.verify_keys: dict[str | None, Any] = {None: secret}
+        self.jwks: bytes = json.dumps({'keys': []}).encode()
+        if self.asymmetric:
+            self._load(Path(key_dir), active_kid)
+        self.jwks_etag = f'"{hashlib.sha1(self.jwks).hexdigest()}"'
+
+    def _load(self, key_dir: Path, active_kid: str | None):
+        from cryptography.hazmat.primitives.serialization import load_pem_private_key, load_pem_public_key
+
+        private_keys, public_keys = {}, {}
+        for path in sorted(key_dir.glob('*.pem')):
+            if path.name.endswith('.pub.pem'):
+                public_keys[path.name.removesuffix('.pub.pem')] = load_pem_public_key(path.read_bytes())
+            else:
+                private_key = load_pem_private_key(path.read_bytes(), password=None)
+                private_keys[path.stem] = private_key
+                public_keys[path.stem] = private_key.public_key()  # type: ignore
+
+        if not active_kid or active_kid not in private_keys:
+            raise RuntimeError(f'JWT签名私钥不存在: {key_dir}/{active_kid}.pem')
+        self.signing_kid = active_kid
+        self.signing_key = private_keys[active_kid]
+        self.verify_keys = dict(public_keys)
+
+        jwk_algorithm = get_default_algorithms()[self.algorithm]
+        keys = []
+        for kid, public_key in public_keys.items():
+            jwk = jwk_algorithm.to_jwk(public_key, as_dict=True)
+            jwk.update({'kid': kid, 'alg': self.algorithm, 'use': 'sig'})
+            keys.append(jwk)
+        self.jwks = json.dumps({'keys': keys}, separators=(',', ':')).encode()
+
+    def sign(self, payload: dict) -> str:
+        headers = {'kid': self.signing_kid} if self.signing_kid else None
+        return jwt.encode(payload, self.signing_key, algorithm=self.algorithm, headers=headers)
+
+    def verify(self, token: str) -> dict:
+        """
+        验签并解码令牌
+
+        Raises:
+            PyJWTError: 令牌无效或 kid 未知
+        """
+        key = self.signing_key
+        if self.asymmetric:
+            kid = jwt.get_unverified_header(token).get('kid')
+            if (key := self.verify_keys.get(kid)) is None:
+                raise jwt.InvalidKeyError(f'unknown kid: {kid}')
+        return jwt.decode(token, key, algorithms=[self.algorithm])
@@ -0,0 +1,61 @@
+from collections.abc import Iterable
+
+
+class _Node:
+    __slots__ = ('children', 'prefixes')
+
+    def __init__(self):
+        self.children: dict[str, _Node] = {}
+        # 以该节点路径为前缀的通配规则中，最后一段的前缀，如 sys:user:* 在 sys->user 节点记录 ''
+        self.prefixes: set[str] = set()
+
+
+class PermissionMatcher:
+    """
+    预编译的权限匹配器：精确权限使用哈希集合，通配权限（以*结尾）按 ':' 分段构建前缀树，
+    单次检查的复杂度只与权限标识的段数有关。
+
+    匹配语义与按字符串前缀匹配一致，例如 sys:user:* 匹配 sys:user:read，sys:us* 匹配 sys:user:read。
+    """
+
+    def __init__(self, permissions: Iterable[str]):
+        self.exact: set[str] = set()
+        self.root = _Node()
+        for perm in permissions:
+            if not perm:
+                continue
+            if perm.endswith('*'):
+                *path, prefix = perm[:-1].split(':')
+                node = self.root
+                for segment in path:
+                    node = node.children.setdefault(segment, _Node())
+                node.prefixes.add(prefix)
+            else:
+                self.exact.add(perm)
+
+    def match(self, perm: str) -> bool:
+        """
+        检查是否具有某个权限
+
+        Args:
+            perm: 权限标识，如 sys:user:read
+
+        Returns:
+            是否匹配
+        """
+        if perm in self.exact:
+            return True
+        node = self.root
+        for segment in perm.split(':'):
+            if any(segment.startswith(prefix) for prefix in node.prefixes):
+                return True
+            node = node.children.get(segment)
+            if node is None:
+                return False
+        return False
+
+    def match_any(self, perms: Iterable[str]) -> bool:
+        return any(self.match(perm) for perm in perms)
+
+    def match_all(self, perms: Iterable[str]) -> bool:
+        return all(self.match(perm) for perm in perms)
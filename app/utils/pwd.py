@@ -1,11 +1,121 @@
+import asyncio
+import time
+from collections.abc import Callable
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any
+
 from passlib.context import CryptContext
 
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.exception import ServiceException
+
 password_context = CryptContext(schemes=['bcrypt'], deprecated='auto')
 
 
-async def get_password_hash(password: str) -> str:
+def _hash(password: str) -> str:
     return password_context.hash(password)
 
 
-async def verify_password(plain_password: str, hashed_password: str) -> bool:
+def _verify(plain_password: str, hashed_password: str) -> bool:
     return password_context.verify(plain_password, hashed_password)
+
+
+def _hash_many(passwords: list[str]) -> list[str]:
+    return [password_context.hash(password) for password in passwords]
+
+
+def _timed(submitted_at: float, fn: Callable[..., Any], *args) -> tuple[Any, float]:
+    # 在工作线程/进程内执行，返回结果和排队等待时间（monotonic在同一主机上跨进程可比）
+    wait = time.monotonic() - submitted_at
+    return fn(*args), wait
+
+
+class PasswordExecutor:
+    """
+    bcrypt 专用的有界执行器，避免哈希计算阻塞事件循环
+
+    并发上限为 max_workers，额外最多排队 max_queue 个任务，超出后立即拒绝，
+    防止登录洪峰拖垮其它接口的延迟。批量任务最多同时占用 bulk_workers 个工作线程，
+    且至少留出一个线程给单次哈希和校验。
+    """
+
+    def __init__(self, kind: str, max_workers: int, max_queue: int, bulk_workers: int):
+        self.kind = kind
+        self.max_workers = max_workers
+        self.max_pending = max_workers + max_queue
+        self.pending = 0
+        self.bulk_slots = asyncio.Semaphore(max(1, min(bulk_workers, max_workers - 1)))
+        self._executor: Executor | None = None
+        metrics.gauge('pwd.in_flight', lambda: self.pending)
+        metrics.gauge('pwd.queue_depth', lambda: max(0, self.pending - self.max_workers))
+
+    @property
+    def executor(self) -> Executor:
+        if self._executor is None:
+            if self.kind == 'process':
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='pwd')
+        return self._executor
+
+    async def run(self, fn: Callable[..., Any], *args) -> Any:
+        """
+        在执行器中运行函数
+
+        Args:
+            fn: 模块级函数（进程池需要可pickle）
+            args: 函数参数
+
+        Returns:
+            函数返回值
+        """
+        if self.pending >= self.max_pending:
+            metrics.incr('pwd.rejected')
+            raise ServiceException(code=503, message='系统繁忙，请稍后重试')
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            result, wait = await loop.run_in_executor(self.executor, _timed, time.monotonic(), fn, *args)
+            metrics.observe('pwd.wait_seconds', wait)
+            return result
+        finally:
+            self.pending -= 1
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+
+password_executor = PasswordExecutor(
+    settings.PASSWORD_EXECUTOR,
+    settings.PASSWORD_MAX_WORKERS,
+    settings.PASSWORD_MAX_QUEUE,
+    settings.PASSWORD_BULK_WORKERS,
+)
+# 批量哈希的分片大小，分片之间释放工作线程，单次任务不必等整批完成
+BULK_CHUNK_SIZE = 8
+
+
+async def get_password_hash(password: str) -> str:
+    return await password_executor.run(_hash, password)
+
+
+async def _hash_chunk(chunk: list[str]) -> list[str]:
+    async with password_executor.bulk_slots:
+        return await password_executor.run(_hash_many, chunk)
+
+
+async def get_password_hashes(passwords: list[str]) -> list[str]:
+    """
+    批量哈希，切分为小分片，所有批量请求合计最多同时占用 PASSWORD_BULK_WORKERS 个工作线程，
+    等待中的分片不占用队列名额
+    """
+    chunks = [passwords[i : i + BULK_CHUNK_SIZE] for i in range(0, len(passwords), BULK_CHUNK_SIZE)]
+    results = await asyncio.gather(*(_hash_chunk(chunk) for chunk in chunks))
+    return [hashed for chunk in results for hashed in chunk]
+
+
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return await password_executor.run(_verify, plain_password, hashed_password)
@@ -0,0 +1,77 @@
+import asyncio
+
+from loguru import logger
+from redis.asyncio import Redis
+
+from app.core.config import settings
+from app.core.metrics import metrics
+
+from .bloom import BloomFilter
+
+BLACKLIST_PREFIX = 'blacklist:'
+REVOKED_CHANNEL = 'token:revoked'
+
+
+class RevocationFilter:
+    """
+    进程内已吊销 jti 的布隆过滤器
+
+    启动时扫描 Redis 黑名单构建，之后通过 pub/sub 接收新吊销的 jti；
+    过滤器未命中即可确定未吊销，命中时才需要到 Redis 确认。
+    订阅断开期间（ready 为 False）所有检查都回退到 Redis。
+    """
+
+    def __init__(self, capacity: int, rebuild_seconds: int):
+        self.capacity = capacity
+        self.rebuild_seconds = rebuild_seconds
+        self.bloom = BloomFilter(capacity)
+        self.ready = False
+        metrics.gauge('revocation_filter.size', lambda: self.bloom.count)
+
+    def add(self, jti: str):
+        self.bloom.add(jti)
+
+    def might_be_revoked(self, jti: str) -> bool:
+        if not self.ready:
+            return True
+        return jti in self.bloom
+
+    async def rebuild(self, redis: Redis):
+        """
+        扫描 Redis 黑名单重建过滤器，已过期的吊销记录不会再进入新过滤器
+        """
+        bloom = BloomFilter(self.capacity)
+        async for key in redis.scan_iter(match=f'{BLACKLIST_PREFIX}*', count=1000):
+            bloom.add(key.removeprefix(BLACKLIST_PREFIX))
+        self.bloom = bloom
+        metrics.incr('revocation_filter.rebuild')
+
+    async def run(self, redis: Redis):
+        """
+        后台任务：订阅吊销频道并定期重建过滤器，断线后自动重连
+        """
+        while True:
+            try:
+                async with redis.pubsub() as pubsub:
+                    await pubsub.subscribe(REVOKED_CHANNEL)
+                    # 先订阅再重建，避免两者之间的吊销消息丢失
+                    await self.rebuild(redis)
+                    self.ready = True
+                    loop = asyncio.get_running_loop()
+                    rebuild_at = loop.time() + self.rebuild_seconds
+                    while True:
+                        message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                        if message is not None:
+                            self.add(message['data'])
+                        if loop.time() >= rebuild_at:
+                            await self.rebuild(redis)
+                            rebuild_at = loop.time() + self.rebuild_seconds
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self.ready = False
+                logger.exception('吊销过滤器订阅中断，5秒后重试')
+                await asyncio.sleep(5)
+
+
+revocation_filter = RevocationFilter(settings.REVOCATION_BLOOM_CAPACITY, settings.REVOCATION_BLOOM_REBUILD_SECONDS)
@@ -0,0 +1,77 @@
+import os
+
+import pytest
+
+
+def pytest_configure(config):
+    # 测试使用独立的数据库和Redis库，避免清空开发数据；须在导入 app 之前设置
+    os.environ['POSTGRES_DB'] = os.environ.get('TEST_POSTGRES_DB', 'forum_test')
+    os.environ['REDIS_DB'] = os.environ.get('TEST_REDIS_DB', '15')
+    # app.core 包导入时加载整个应用，先完整导入，避免测试模块从中间模块开始导入时循环导入
+    import app.core.server  # noqa: F401
+
+
+@pytest.fixture
+async def engine():
+    """
+    每个测试独立的数据库引擎，不使用连接池（asyncpg连接绑定事件循环，不能跨测试复用）
+    """
+    from sqlalchemy import text
+    from sqlalchemy.exc import DBAPIError
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from sqlalchemy.pool import NullPool
+
+    from app.core.config import settings
+    from app.core.database import _connect_args
+    from app.models.base import Base
+
+    test_engine = create_async_engine(str(settings.DATABASE_URL), poolclass=NullPool, connect_args=_connect_args())
+    try:
+        async with test_engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+    except (OSError, DBAPIError) as e:
+        await test_engine.dispose()
+        pytest.skip(f'数据库不可用: {e}')
+    yield test_engine
+    async with test_engine.begin() as conn:
+        tables = ', '.join(f'"{table.name}"' for table in Base.metadata.sorted_tables)
+        await conn.execute(text(f'TRUNCATE {tables} RESTART IDENTITY CASCADE'))
+    await test_engine.dispose()
+
+
+@pytest.fixture
+async def db(engine):
+    """
+    主库会话，测试结束时回滚未提交的数据
+    """
+    from sqlalchemy.ext.asyncio import AsyncSession
+
+    async with AsyncSession(engine, expire_on_commit=False, autoflush=False) as session:
+        yield session
+
+
+@pytest.fixture
+async def redis():
+    """
+    测试专用的Redis连接，测试结束时清空测试库
+    """
+    from redis.asyncio import Redis
+    from redis.exceptions import ConnectionError as RedisConnectionError
+
+    from app.core.config import settings
+
+    client = Redis(
+        host=settings.REDIS_HOST,
+        port=settings.REDIS_PORT,
+        db=settings.REDIS_DB,
+        password=settings.REDIS_PASSWORD,
+        decode_responses=True,
+    )
+    try:
+        await client.flushdb()
+    except RedisConnectionError as e:
+        await client.aclose()
+        pytest.skip(f'Redis不可用: {e}')
+    yield client
+    await client.flushdb()
+    await client.aclose()
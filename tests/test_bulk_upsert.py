@@ -0,0 +1,76 @@
+import pytest
+from sqlalchemy import func, select
+
+from app.core.config import settings
+from app.models.user import User, UserCreateDTO
+from app.repository.user import UserRepository
+
+
+def _user(username: str, email: str) -> UserCreateDTO:
+    return UserCreateDTO(
+        username=username,
+        email=email,
+        password='hashed',
+        gender=None,
+        birthday=None,
+        nickname=None,
+        phone=None,
+        created_by=1,
+        updated_by=1,
+    )
+
+
+def _batch(size: int) -> list[UserCreateDTO]:
+    """
+    size 行，其中 dup 出现三次，email 依次为 first/middle/last
+    """
+    users = [_user('dup', 'first@example.com')]
+    users += [_user(f'user{i}', f'user{i}@example.com') for i in range(size - 3)]
+    users.insert(len(users) // 2, _user('dup', 'middle@example.com'))
+    users.append(_user('dup', 'last@example.com'))
+    return users
+
+
+@pytest.fixture(params=['insert', 'copy'])
+def bulk_size(request, monkeypatch):
+    """
+    批量行数分别低于和达到 COPY 阈值，并确认走到了对应的写入路径
+    """
+    calls = []
+    original = UserRepository._bulk_copy
+
+    async def spy(self, *args, **kwargs):
+        calls.append(len(args[1]))
+        return await original(self, *args, **kwargs)
+
+    monkeypatch.setattr(UserRepository, '_bulk_copy', spy)
+    yield 5 if request.param == 'insert' else settings.BULK_COPY_THRESHOLD
+    assert bool(calls) == (request.param == 'copy')
+
+
+def test_copy_threshold_within_bulk_limit():
+    assert settings.BULK_COPY_THRESHOLD <= settings.USER_BULK_MAX_SIZE
+
+
+async def test_bulk_upsert_update_keeps_last_duplicate(db, bulk_size):
+    repository = UserRepository(db)
+    db.add(User(username='dup', email='old@example.com', password='hashed', created_by=1, updated_by=1))
+    await db.flush()
+
+    affected = await repository.bulk_upsert(_batch(bulk_size), index_elements=['username'], update_fields=['email'])
+
+    assert affected == bulk_size - 2
+    assert await db.scalar(select(User.email).where(User.username == 'dup')) == 'last@example.com'
+    assert await db.scalar(select(func.count()).select_from(User)) == bulk_size - 2
+
+
+async def test_bulk_upsert_ignore_keeps_existing_row(db, bulk_size):
+    repository = UserRepository(db)
+    db.add(User(username='dup', email='old@example.com', password='hashed', created_by=1, updated_by=1))
+    await db.flush()
+
+    affected = await repository.bulk_upsert(_batch(bulk_size), index_elements=['username'])
+
+    assert affected == bulk_size - 3
+    assert await db.scalar(select(User.email).where(User.username == 'dup')) == 'old@example.com'
+    assert await db.scalar(select(func.count()).select_from(User)) == bulk_size - 2
@@ -0,0 +1,47 @@
+from datetime import datetime
+
+import pytest
+
+from app.exception import ServiceException
+from app.models.user import User
+from app.repository.user import UserRepository
+
+
+@pytest.fixture
+async def users(db):
+    # created_at 有重复值，依靠 id 保证翻页时不丢不重
+    db.add_all(
+        User(
+            username=f'user{i:02d}',
+            email=f'user{i}@example.com',
+            password='hashed',
+            nickname=None if i % 2 else f'nick{i}',
+            created_at=datetime(2024, 1, 1 + i // 3),
+            created_by=1,
+            updated_by=1,
+        )
+        for i in range(10)
+    )
+    await db.flush()
+
+
+@pytest.mark.parametrize('sort_key', ['id', 'username', 'created_at'])
+async def test_cursor_pages_cover_all_rows(db, users, sort_key):
+    repository = UserRepository(db)
+    seen, cursor = [], None
+    while True:
+        page = await repository.paginate_by_cursor(cursor, page_size=3, sort_key=sort_key)
+        seen += [user.username for user in page.data]
+        if not (cursor := page.next_cursor):
+            break
+
+    assert sorted(seen) == [f'user{i:02d}' for i in range(10)]
+    assert len(seen) == len(set(seen))
+
+
+@pytest.mark.parametrize('sort_key', ['nickname', 'deleted_at', 'roles', 'missing'])
+async def test_nullable_or_unknown_sort_key_rejected(db, sort_key):
+    with pytest.raises(ServiceException) as exc_info:
+        await UserRepository(db).paginate_by_cursor(sort_key=sort_key)
+
+    assert exc_info.value.code == 400
@@ -0,0 +1,31 @@
+from app.service.security_cache import security_user_cache
+from app.service.session import SessionStore
+
+USER_ID = 7
+USERNAME = 'alice'
+
+
+def _user_generation_key() -> str:
+    return security_user_cache.generation_keys(USERNAME)[1]
+
+
+async def test_invalidate_user_keeps_generation(redis):
+    await security_user_cache.invalidate_user(redis, USERNAME)
+    await security_user_cache.invalidate_user(redis, USERNAME)
+
+    assert await redis.get(_user_generation_key()) == '2'
+    assert await redis.ttl(_user_generation_key()) == -1
+
+
+async def test_session_revoke_and_reuse_keep_generation(redis):
+    store = SessionStore(redis)
+    await store.create(USER_ID, 'sid', 'access', 'jti-1')
+    assert await store.rotate(USER_ID, USERNAME, 'sid', 'jti-1', 'jti-2', 'access-2') == 1
+    # 再次提交已轮换的刷新令牌视为重用
+    assert await store.rotate(USER_ID, USERNAME, 'sid', 'jti-1', 'jti-3', 'access-3') == -1
+    assert await redis.ttl(_user_generation_key()) == -1
+
+    await store.create(USER_ID, 'sid2', 'access', 'jti-4')
+    await store.revoke(USER_ID, USERNAME, 'sid2')
+    assert await redis.get(_user_generation_key()) == '2'
+    assert await redis.ttl(_user_generation_key()) == -1
@@ -0,0 +1,90 @@
+import time
+import uuid
+
+import pytest
+
+import app.core.cache
+import app.utils.jwt
+from app.utils.jwt import decode_token, key_ring
+
+
+class ShiftedClock:
+    """
+    可向前拨动的时钟，只替换缓存和JWT模块中的 time，不影响事件循环
+    """
+
+    def __init__(self):
+        self.offset = 0.0
+
+    def time(self) -> float:
+        return time.time() + self.offset
+
+    def monotonic(self) -> float:
+        return time.monotonic() + self.offset
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = ShiftedClock()
+    monkeypatch.setattr(app.core.cache, 'time', clock)
+    monkeypatch.setattr(app.utils.jwt, 'time', clock)
+    return clock
+
+
+@pytest.fixture
+def verify_calls(monkeypatch):
+    calls = []
+    verify = key_ring.verify
+
+    def counting_verify(token: str) -> dict:
+        calls.append(token)
+        return verify(token)
+
+    monkeypatch.setattr(key_ring, 'verify', counting_verify)
+    return calls
+
+
+def _token(**claims) -> str:
+    return key_ring.sign({'subject': 'alice', 'jti': uuid.uuid4().hex, **claims})
+
+
+async def test_cache_hit_skips_verification(verify_calls):
+    token = _token(exp=int(time.time()) + 60)
+
+    first = await decode_token(token)
+    first['subject'] = 'mallory'  # type: ignore
+    second = await decode_token(token)
+
+    assert len(verify_calls) == 1
+    assert second is not None and second['subject'] == 'alice'
+
+
+async def test_cache_entry_not_served_past_exp(verify_calls, clock):
+    exp = int(time.time()) + 60
+    token = _token(exp=exp)
+
+    await decode_token(token)
+    clock.offset = exp - time.time() - 1
+    await decode_token(token)
+    assert len(verify_calls) == 1
+
+    clock.offset = exp - time.time() + 1
+    await decode_token(token)
+    assert len(verify_calls) == 2
+
+
+async def test_token_without_exp_not_cached(verify_calls):
+    token = _token()
+
+    await decode_token(token)
+    await decode_token(token)
+
+    assert len(verify_calls) == 2
+
+
+async def test_invalid_token_not_cached(verify_calls):
+    token = _token(exp=int(time.time()) + 60)[:-2] + 'xx'
+
+    assert await decode_token(token) is None
+    assert await decode_token(token) is None
+    assert len(verify_calls) == 2
@@ -0,0 +1,80 @@
+import pytest
+from sqlalchemy import event
+from sqlalchemy.exc import InvalidRequestError
+
+from app.models.menu import Menu
+from app.models.role import Role
+from app.models.user import User
+from app.repository.base import CountStrategy, LoadProfile
+from app.repository.user import UserRepository
+from app.service.auth import AuthService
+
+USER_COUNT = 20
+
+
+@pytest.fixture
+async def seeded(db):
+    """
+    3 个角色各 4 个菜单，每个用户 2 个角色
+    """
+    audit = {'created_by': 1, 'updated_by': 1}
+    roles = []
+    for i in range(3):
+        menus = [
+            Menu(name=f'menu{i}-{j}', code=f'menu{i}-{j}', perms=f'perm:{i}:{j}', type=2, **audit) for j in range(4)
+        ]
+        roles.append(Role(name=f'role{i}', code=f'role{i}', menus=menus, **audit))
+    db.add_all(
+        User(
+            username=f'user{i}',
+            email=f'user{i}@example.com',
+            password='hashed',
+            roles=[roles[i % 3], roles[(i + 1) % 3]],
+            **audit,
+        )
+        for i in range(USER_COUNT)
+    )
+    await db.commit()
+    db.expunge_all()
+
+
+@pytest.fixture
+def statements(engine):
+    """
+    记录引擎执行的每条SQL
+    """
+    executed = []
+
+    def before_cursor_execute(connection, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+
+    event.listen(engine.sync_engine, 'before_cursor_execute', before_cursor_execute)
+    yield executed
+    event.remove(engine.sync_engine, 'before_cursor_execute', before_cursor_execute)
+
+
+async def test_paginate_auth_profile_statement_count(db, seeded, statements):
+    page = await UserRepository(db).paginate(1, USER_COUNT, LoadProfile.AUTH, CountStrategy.EXACT)
+
+    assert len(page.data) == USER_COUNT
+    assert sum(len(role.menus) for user in page.data for role in user.roles) == USER_COUNT * 2 * 4
+    # count + 用户 + 角色 + 菜单，与用户数无关
+    assert len(statements) == 4
+
+
+async def test_paginate_none_profile_does_not_load_relations(db, seeded, statements):
+    page = await UserRepository(db).paginate(1, USER_COUNT, LoadProfile.NONE, CountStrategy.EXACT)
+
+    assert len(statements) == 2
+    with pytest.raises(InvalidRequestError):
+        _ = page.data[0].roles
+
+
+async def test_load_security_user_statement_count(db, seeded, statements, redis):
+    security_user = await AuthService(UserRepository(db), redis).load_security_user('user1')
+
+    assert security_user is not None
+    assert sorted(security_user.roles) == ['role1', 'role2']
+    assert len(security_user.permissions) == 8
+    # 用户 + 角色 + 菜单
+    assert len(statements) == 3
@@ -0,0 +1,63 @@
+import pytest
+from sqlalchemy import event
+from sqlalchemy.engine.interfaces import CacheStats
+
+from app.exception import ServiceException
+from app.models.user import User
+from app.repository.base import LoadProfile
+from app.repository.user import UserRepository
+
+
+@pytest.fixture
+async def users(db):
+    audit = {'created_by': 1, 'updated_by': 1}
+    db.add_all(
+        [
+            User(username='alice', email='alice@example.com', password='hashed', nickname='Alice', **audit),
+            User(username='bob', email='bob@example.com', password='hashed', nickname=None, **audit),
+        ]
+    )
+    await db.flush()
+
+
+async def test_lookup_by_none_matches_null(db, users):
+    repository = UserRepository(db)
+
+    user = await repository.get_one_by_field('nickname', None)
+    assert user is not None and user.username == 'bob'
+    assert await repository.get_id_by_field('nickname', None) == user.id
+    assert [user.username for user in await repository.get_all_by_field('nickname', None)] == ['bob']
+    assert (await repository.get_one_by_field('nickname', 'Alice')).username == 'alice'  # type: ignore
+
+
+async def test_unknown_field_rejected(db):
+    repository = UserRepository(db)
+
+    with pytest.raises(ServiceException):
+        await repository.get_one_by_field('roles', 1)
+    with pytest.raises(ServiceException):
+        await anext(repository.stream_rows(['id', 'no_such_column']))
+
+
+async def test_template_reused_across_values(db, users, engine):
+    """
+    不同查询值复用同一语句对象，第二次执行命中编译缓存
+    """
+    repository = UserRepository(db)
+    first, _ = repository.templates.by_field('username', 'alice', LoadProfile.NONE)
+    second, _ = repository.templates.by_field('username', 'bob', LoadProfile.NONE)
+    assert first is second
+    assert first._generate_cache_key() is second._generate_cache_key()
+
+    cache_hits = []
+
+    def after_cursor_execute(connection, cursor, statement, parameters, context, executemany):
+        cache_hits.append(context.cache_hit)
+
+    event.listen(engine.sync_engine, 'after_cursor_execute', after_cursor_execute)
+    try:
+        await repository.get_one_by_field('username', 'alice')
+        await repository.get_one_by_field('username', 'bob')
+    finally:
+        event.remove(engine.sync_engine, 'after_cursor_execute', after_cursor_execute)
+    assert cache_hits[-1] == CacheStats.CACHE_HIT
@@ -0,0 +1,72 @@
+import asyncio
+
+import pytest
+
+from app.core.breaker import BreakerState, CircuitBreaker
+from app.core.config import settings
+from app.core.redis import BreakerRedis, MeteredConnectionPool, _guarded
+
+
+class RecordingBreaker(CircuitBreaker):
+    def __init__(self):
+        super().__init__('test', min_calls=1, slow_call_seconds=0.2)
+        self.records: list[tuple[bool, float]] = []
+
+    def record(self, success: bool, duration: float):
+        self.records.append((success, duration))
+        super().record(success, duration)
+
+
+@pytest.fixture
+async def pool(redis):
+    pool = MeteredConnectionPool(
+        host=settings.REDIS_HOST,
+        port=settings.REDIS_PORT,
+        db=settings.REDIS_DB,
+        password=settings.REDIS_PASSWORD,
+        decode_responses=True,
+        max_connections=1,
+        timeout=5,
+    )
+    yield pool
+    await pool.disconnect()
+
+
+async def test_cancelled_call_not_recorded():
+    breaker = RecordingBreaker()
+    breaker._transition(BreakerState.OPEN)
+    breaker.opened_at -= breaker.open_seconds
+    started = asyncio.Event()
+
+    async def call():
+        started.set()
+        await asyncio.sleep(10)
+
+    task = asyncio.create_task(_guarded(breaker, call))
+    await started.wait()
+    assert breaker.state == BreakerState.HALF_OPEN and breaker._probing
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    assert breaker.records == []
+    # 探测名额已释放，下一次调用可以作为探测放行
+    assert breaker.state == BreakerState.HALF_OPEN and breaker.allow()
+
+
+async def test_checkout_wait_excluded_from_duration(pool):
+    breaker = RecordingBreaker()
+    client = BreakerRedis(connection_pool=pool, breaker=breaker)
+    held = await pool.get_connection('PING')
+
+    async def release_later():
+        await asyncio.sleep(0.3)
+        await pool.release(held)
+
+    release = asyncio.create_task(release_later())
+    assert await client.ping()
+    await release
+
+    [(success, duration)] = breaker.records
+    assert success
+    assert duration < breaker.slow_call_seconds
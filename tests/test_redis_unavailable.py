@@ -0,0 +1,42 @@
+import math
+
+import pytest
+from fastapi import FastAPI
+from starlette.requests import Request
+
+from app.core.breaker import BreakerState, CircuitBreaker, CircuitOpenError
+from app.core.config import settings
+from app.core.redis import REDIS_UNAVAILABLE_ERRORS, BreakerRedis
+from app.exception import global_excetption_handler
+from app.service.rate_limit import LoginRateLimiter
+
+
+@pytest.fixture
+def open_redis():
+    """
+    熔断器已打开的Redis客户端，任何命令都抛出 CircuitOpenError 而不访问网络
+    """
+    breaker = CircuitBreaker('test')
+    breaker._transition(BreakerState.OPEN)
+    return BreakerRedis(host='127.0.0.1', port=1, breaker=breaker)
+
+
+@pytest.mark.parametrize('error', REDIS_UNAVAILABLE_ERRORS)
+async def test_redis_unavailable_returns_503(error):
+    app = FastAPI()
+    global_excetption_handler(app)
+    request = Request({'type': 'http', 'method': 'GET', 'path': '/', 'query_string': b'', 'headers': [], 'app': app})
+
+    response = await app.exception_handlers[error](request, error('down'))
+
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == str(math.ceil(settings.REDIS_BREAKER_OPEN_SECONDS))
+
+
+async def test_login_rate_limit_fails_open(open_redis):
+    limiter = LoginRateLimiter(1, 1, 1, 1)
+
+    with pytest.raises(CircuitOpenError):
+        await open_redis.get('any')
+    for _ in range(3):
+        await limiter.check(open_redis, 'alice', '127.0.0.1')
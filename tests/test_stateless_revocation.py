@@ -0,0 +1,49 @@
+import pytest
+
+import app.service.stateless
+from app.models.security import SecurityUser
+from app.models.user import PrueUserVO
+from app.service.session import SessionStore
+from app.service.stateless import RevocationWatermark, build_stateless_claims, resolve_stateless_user
+
+
+async def _stateless_payload(redis, db, user_id: int, username: str) -> dict:
+    security_user = SecurityUser(user=PrueUserVO(id=user_id, username=username), roles=['member'], permissions=[])
+    claims = await build_stateless_claims(redis, db, security_user, watermark=0, generation=(0, 0))
+    return {'subject': username, **claims}
+
+
+@pytest.fixture
+def watermark(monkeypatch):
+    def install(poll_seconds: float) -> RevocationWatermark:
+        watermark = RevocationWatermark(poll_seconds)
+        monkeypatch.setattr(app.service.stateless, 'revocation_watermark', watermark)
+        return watermark
+
+    return install
+
+
+async def test_revoked_token_rejected_without_poll_window(redis, db, watermark):
+    watermark(0)
+    alice = await _stateless_payload(redis, db, 1, 'alice')
+    bob = await _stateless_payload(redis, db, 2, 'bob')
+    assert await resolve_stateless_user(redis, alice) is not None
+
+    await SessionStore(redis).revoke_all(1, 'alice')
+
+    assert await resolve_stateless_user(redis, alice) is None
+    # 水位变化后其他用户的令牌仍按自己的版本放行
+    assert await resolve_stateless_user(redis, bob) is not None
+
+
+async def test_revocation_delayed_at_most_one_poll_window(redis, db, watermark):
+    revocation_watermark = watermark(60)
+    alice = await _stateless_payload(redis, db, 1, 'alice')
+    assert await resolve_stateless_user(redis, alice) is not None
+
+    await SessionStore(redis).revoke_all(1, 'alice')
+    # 本地水位尚未刷新，窗口内仍然放行
+    assert await resolve_stateless_user(redis, alice) is not None
+
+    revocation_watermark.fetched_at -= revocation_watermark.poll_seconds
+    assert await resolve_stateless_user(redis, alice) is None
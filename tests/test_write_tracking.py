@@ -0,0 +1,35 @@
+import pytest
+from sqlalchemy import delete, insert, select, text, update
+
+from app.core.database import has_pending_writes
+from app.models.user import User
+from app.repository.base import CountStrategy
+from app.repository.user import UserRepository
+
+
+@pytest.mark.parametrize(
+    ('statement', 'writes'),
+    [
+        (select(User), False),
+        (text('SELECT 1'), False),
+        (text('  select count(*) from "user"'), False),
+        (text('EXPLAIN SELECT 1'), False),
+        (text('UPDATE "user" SET nickname = NULL'), True),
+        (text('WITH moved AS (DELETE FROM "user" RETURNING id) SELECT count(*) FROM moved'), True),
+        (insert(User).values(username='alice', email='a@example.com', password='x', created_by=1, updated_by=1), True),
+        (update(User).values(nickname='x'), True),
+        (delete(User), True),
+    ],
+)
+async def test_execute_tracks_writes(db, statement, writes):
+    await db.execute(statement)
+
+    assert has_pending_writes(db) is writes
+    await db.rollback()
+    assert not has_pending_writes(db)
+
+
+async def test_estimated_count_is_not_a_write(db):
+    await UserRepository(db).count(CountStrategy.ESTIMATED)
+
+    assert not has_pending_writes(db)